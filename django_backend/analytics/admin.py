@@ -0,0 +1,54 @@
+from django.contrib import admin
+from .models import SalesRollup, RollupWatermark, SellerSales, ProductSales
+
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    """Sales Rollup Admin (maintained by update_sales_rollups)"""
+    list_display = ['bucket', 'period', 'dimension', 'key', 'revenue', 'orders_count', 'units']
+    list_filter = ['period', 'dimension']
+    date_hierarchy = 'bucket'
+    ordering = ['-bucket']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    """Rollup Watermark Admin"""
+    list_display = ['name', 'processed_until', 'updated_at']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(SellerSales)
+class SellerSalesAdmin(admin.ModelAdmin):
+    """Seller Sales Admin (counters, rebuilt by rebuild_seller_sales)"""
+    list_display = ['seller', 'revenue', 'orders_count', 'units', 'updated_at']
+    search_fields = ['seller__email']
+    list_select_related = ['seller']
+    ordering = ['-revenue']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProductSales)
+class ProductSalesAdmin(admin.ModelAdmin):
+    """Product Sales Admin"""
+    list_display = ['product', 'seller', 'revenue', 'units']
+    search_fields = ['product__title', 'seller__email']
+    list_select_related = ['product', 'seller']
+    ordering = ['-revenue']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from analytics.utils.sellers import rebuild_sales
+
+
+class Command(BaseCommand):
+    help = 'Recompute the seller and product sales counters from all orders'
+    
+    def handle(self, *args, **options):
+        sellers = rebuild_sales()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales counters of {sellers} sellers.'))
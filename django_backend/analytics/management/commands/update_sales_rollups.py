@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from analytics.utils.rollups import update_rollups
+from analytics.utils.sellers import apply_sales_deltas
+
+
+class Command(BaseCommand):
+    help = 'Update the sales rollups from orders changed since the last run, and the seller sales counters'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute every rollup from scratch')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running, updating every INTERVAL seconds')
+    
+    def handle(self, *args, **options):
+        rebuild = options['rebuild']
+        while True:
+            hours = update_rollups(rebuild=rebuild)
+            deltas = apply_sales_deltas()
+            self.stdout.write(self.style.SUCCESS(
+                f'Recomputed sales rollups for {hours} hours, applied {deltas} seller sales deltas.'
+            ))
+            
+            rebuild = False
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,125 @@
+from django.db import models
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+
+
+class SalesRollup(models.Model):
+    """Sales totals of one hour or day, overall or for one product, category or seller"""
+    PERIOD_CHOICES = (
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    )
+    
+    DIMENSION_CHOICES = (
+        ('total', 'Total'),
+        ('product', 'Product'),
+        ('category', 'Category'),
+        ('seller', 'Seller'),
+    )
+    
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField()  # Start of the hour or day
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    key = models.BigIntegerField(default=0)  # Product, category or seller id, 0 for totals
+    
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders_count = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = _('sales rollup')
+        verbose_name_plural = _('sales rollups')
+        ordering = ['period', 'dimension', 'key', 'bucket']
+        constraints = [
+            # Also serves date range reads of one series
+            models.UniqueConstraint(
+                fields=['period', 'dimension', 'key', 'bucket'],
+                name='unique_sales_rollup_bucket'
+            ),
+        ]
+        indexes = [
+            # Rankings over a date range
+            models.Index(fields=['period', 'dimension', 'bucket']),
+        ]
+    
+    def __str__(self):
+        return f"{self.dimension} {self.key} {self.period} {self.bucket:%Y-%m-%d %H:%M}"
+
+
+class RollupWatermark(models.Model):
+    """How far a rollup job has read the orders it aggregates"""
+    name = models.CharField(max_length=50, unique=True)
+    processed_until = models.DateTimeField()  # Orders updated up to here are included
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('rollup watermark')
+        verbose_name_plural = _('rollup watermarks')
+    
+    def __str__(self):
+        return f"{self.name} until {self.processed_until}"
+
+
+class SellerSales(models.Model):
+    """Lifetime sales of one seller, kept up to date from the sales deltas"""
+    seller = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sales'
+    )
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('seller sales')
+        verbose_name_plural = _('seller sales')
+    
+    def __str__(self):
+        return f"Sales of seller {self.seller_id}"
+
+
+class ProductSales(models.Model):
+    """Lifetime sales of one product, ranked per seller on the seller dashboard"""
+    product = models.OneToOneField(
+        'products.Product',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sales'
+    )
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='product_sales')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = _('product sales')
+        verbose_name_plural = _('product sales')
+        indexes = [
+            # Top products of a seller
+            models.Index(fields=['seller', '-revenue']),
+        ]
+    
+    def __str__(self):
+        return f"Sales of product {self.product_id}"
+
+
+class SalesDelta(models.Model):
+    """
+    Sales of one product in one order, or their reversal, waiting to be added
+    to the seller and product counters by update_sales_rollups
+    """
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    product = models.ForeignKey('products.Product', on_delete=models.SET_NULL, null=True, related_name='+')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)  # Negative for reversals
+    units = models.IntegerField()
+    orders_count = models.IntegerField(default=0)  # Set on one row per seller and order
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('sales delta')
+        verbose_name_plural = _('sales deltas')
+    
+    def __str__(self):
+        return f"{self.revenue} for seller {self.seller_id}"
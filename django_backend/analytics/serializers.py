@@ -0,0 +1,10 @@
+from rest_framework import serializers
+from .models import SalesRollup
+
+
+class SalesRollupSerializer(serializers.ModelSerializer):
+    """Sales Rollup Serializer"""
+    class Meta:
+        model = SalesRollup
+        fields = ['bucket', 'revenue', 'orders_count', 'units']
+        read_only_fields = fields
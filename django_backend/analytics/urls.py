@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import SalesSeriesView, SalesTopView
+
+app_name = 'analytics'
+
+urlpatterns = [
+    path('sales/', SalesSeriesView.as_view(), name='sales_series'),
+    path('sales/top/', SalesTopView.as_view(), name='sales_top'),
+]
@@ -0,0 +1,172 @@
+"""
+Sales rollups.
+
+Revenue, order count and units sold are aggregated per hour and per day,
+overall and per product, category and seller, into ``SalesRollup`` rows so
+analytics reads never scan the order tables. ``update_rollups`` looks up the
+orders changed since its watermark and recomputes only the hours they were
+placed in, then the days holding those hours from the hourly rows. Hours are
+always recomputed from both the live and the archived orders.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from orders.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from ..models import RollupWatermark, SalesRollup
+
+WATERMARK = 'sales'
+
+# Orders in these states don't count as sales
+EXCLUDED_STATUSES = ['cancelled', 'returned']
+
+# Rollup dimension -> OrderItem field holding its key
+DIMENSIONS = {
+    'total': None,
+    'product': 'product_id',
+    'category': 'product__category_id',
+    # The seller recorded on the item at checkout, like the seller sales counters
+    'seller': 'seller_id',
+}
+
+# Buckets recomputed per statement, bounds the size of the range filters
+BUCKETS_PER_BATCH = 100
+
+
+def _ranges(field, starts, length):
+    """Filter matching ``field`` inside any of the given buckets"""
+    condition = Q()
+    for start in starts:
+        condition |= Q(**{f'{field}__gte': start, f'{field}__lt': start + length})
+    return condition
+
+
+def _start_of_day(moment):
+    return timezone.localtime(moment).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _aggregate_hours(hours):
+    """Hourly rollup rows of the given hours, computed from the live and archived order items"""
+    rollups = {}
+    for item_model in (OrderItem, ArchivedOrderItem):
+        items = item_model.objects.filter(
+            _ranges('order__created_at', hours, timedelta(hours=1))
+        ).exclude(
+            order__status__in=EXCLUDED_STATUSES
+        ).annotate(bucket=TruncHour('order__created_at'))
+        
+        for dimension, field in DIMENSIONS.items():
+            rows = items
+            group_by = ['bucket']
+            if field:
+                # Items of deleted products, products without a category or without a seller have no key
+                rows = rows.filter(**{f'{field}__isnull': False})
+                group_by.append(field)
+            rows = rows.values(*group_by).annotate(
+                revenue=Sum(F('product_price') * F('quantity')),
+                orders_count=Count('order', distinct=True),
+                units=Sum('quantity')
+            ).order_by()
+            
+            for row in rows:
+                key = row[field] if field else 0
+                rollup = rollups.get((dimension, key, row['bucket']))
+                if rollup is None:
+                    rollups[dimension, key, row['bucket']] = SalesRollup(
+                        period='hour',
+                        bucket=row['bucket'],
+                        dimension=dimension,
+                        key=key,
+                        revenue=row['revenue'],
+                        orders_count=row['orders_count'],
+                        units=row['units']
+                    )
+                else:
+                    # An order is either live or archived, so the two sides simply add up
+                    rollup.revenue += row['revenue']
+                    rollup.orders_count += row['orders_count']
+                    rollup.units += row['units']
+    return list(rollups.values())
+
+
+def _aggregate_days(days):
+    """Daily rollup rows of the given days, summed from their hourly rows"""
+    rows = SalesRollup.objects.filter(
+        _ranges('bucket', days, timedelta(days=1)),
+        period='hour'
+    ).annotate(day=TruncDay('bucket')).values('dimension', 'key', 'day').annotate(
+        total_revenue=Sum('revenue'),
+        total_orders=Sum('orders_count'),
+        total_units=Sum('units')
+    ).order_by()
+    return [
+        SalesRollup(
+            period='day',
+            bucket=row['day'],
+            dimension=row['dimension'],
+            key=row['key'],
+            revenue=row['total_revenue'],
+            orders_count=row['total_orders'],
+            units=row['total_units']
+        )
+        for row in rows
+    ]
+
+
+def _changed_hours(since, until):
+    """
+    Hours in which the orders updated between the two moments were placed.
+    Without ``since`` every hour with an order, live or archived, is returned.
+    """
+    orders = Order.objects.filter(updated_at__lte=until)
+    if since is not None:
+        orders = orders.filter(updated_at__gt=since)
+    hours = set(orders.annotate(hour=TruncHour('created_at')).values_list('hour', flat=True))
+    if since is None:
+        # Archived orders don't change anymore, they only matter when rebuilding
+        hours.update(
+            ArchivedOrder.objects.annotate(hour=TruncHour('created_at')).values_list('hour', flat=True)
+        )
+    return sorted(hours)
+
+
+def update_rollups(rebuild=False):
+    """
+    Bring the rollups up to date with the orders changed since the last run,
+    or recompute all of them with ``rebuild``. Returns the number of hours
+    recomputed.
+    
+    Orders updated in the last ANALYTICS_ROLLUP_LAG_SECONDS are left for the
+    next run, so transactions still in flight when this one reads aren't missed.
+    """
+    until = timezone.now() - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG_SECONDS)
+    
+    with transaction.atomic():
+        # Lock the watermark so concurrent runs don't interleave
+        watermark = RollupWatermark.objects.select_for_update().filter(name=WATERMARK).first()
+        since = watermark.processed_until if watermark and not rebuild else None
+        if since is None:
+            SalesRollup.objects.all().delete()
+        
+        hours = _changed_hours(since, until)
+        for i in range(0, len(hours), BUCKETS_PER_BATCH):
+            batch = hours[i:i + BUCKETS_PER_BATCH]
+            SalesRollup.objects.filter(period='hour', bucket__in=batch).delete()
+            SalesRollup.objects.bulk_create(_aggregate_hours(batch))
+        
+        days = sorted({_start_of_day(hour) for hour in hours})
+        for i in range(0, len(days), BUCKETS_PER_BATCH):
+            batch = days[i:i + BUCKETS_PER_BATCH]
+            SalesRollup.objects.filter(period='day', bucket__in=batch).delete()
+            SalesRollup.objects.bulk_create(_aggregate_days(batch))
+        
+        RollupWatermark.objects.update_or_create(
+            name=WATERMARK,
+            defaults={'processed_until': until}
+        )
+    
+    return len(hours)
@@ -0,0 +1,174 @@
+"""
+Seller sales counters.
+
+``SellerSales`` and ``ProductSales`` hold the lifetime revenue and units of
+every seller and product, so the seller dashboard reads a handful of rows
+instead of aggregating the order history. Checkout and cancellation only
+append ``SalesDelta`` rows; ``apply_sales_deltas``, run by
+update_sales_rollups, adds them to the counters in batches, so a popular
+product's counter row is never locked by checkouts. ``rebuild_sales``
+recomputes the counters from the live and archived orders.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Sum, Value, When
+
+from orders.models import ArchivedOrderItem, OrderItem
+from ..models import ProductSales, SalesDelta, SellerSales
+from .rollups import EXCLUDED_STATUSES
+
+# Sales deltas added to the counters per transaction
+DELTAS_PER_BATCH = 5000
+
+
+def _by_pk(values, output_field):
+    """Expression picking each row's value from a {pk: value} dict"""
+    return Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in values.items()],
+        default=Value(0),
+        output_field=output_field
+    )
+
+
+def record_sales(items, sign=1):
+    """
+    Queue the given order items for the seller and product counters, or
+    their reversal with ``sign=-1``. Items without a seller are ignored.
+    
+    Only appends ``SalesDelta`` rows, so checkouts of the same products never
+    wait on each other's counter rows; ``apply_sales_deltas`` adds them up.
+    """
+    deltas = []
+    counted = set()
+    for item in items:
+        if item.seller_id is None:
+            continue
+        # Each order counts once per seller, on the first of its rows
+        order_key = (item.seller_id, item.order_id)
+        deltas.append(SalesDelta(
+            seller_id=item.seller_id,
+            product_id=item.product_id,
+            revenue=sign * item.product_price * item.quantity,
+            units=sign * item.quantity,
+            orders_count=0 if order_key in counted else sign
+        ))
+        counted.add(order_key)
+    SalesDelta.objects.bulk_create(deltas)
+
+
+def _add_totals(sellers, products):
+    """Add {pk: totals} amounts to the seller and product counters, creating missing rows"""
+    # New rows are created with zeros, then every row gets its amount in one UPDATE
+    SellerSales.objects.bulk_create([SellerSales(pk=pk) for pk in sellers], ignore_conflicts=True)
+    SellerSales.objects.filter(pk__in=sellers).update(
+        revenue=F('revenue') + _by_pk(
+            {pk: totals['revenue'] for pk, totals in sellers.items()}, DecimalField()
+        ),
+        units=F('units') + _by_pk(
+            {pk: totals['units'] for pk, totals in sellers.items()}, IntegerField()
+        ),
+        orders_count=F('orders_count') + _by_pk(
+            {pk: totals['orders_count'] for pk, totals in sellers.items()}, IntegerField()
+        )
+    )
+    
+    if products:
+        ProductSales.objects.bulk_create([
+            ProductSales(pk=pk, seller_id=totals['seller_id'])
+            for pk, totals in products.items()
+        ], ignore_conflicts=True)
+        ProductSales.objects.filter(pk__in=products).update(
+            revenue=F('revenue') + _by_pk(
+                {pk: totals['revenue'] for pk, totals in products.items()}, DecimalField()
+            ),
+            units=F('units') + _by_pk(
+                {pk: totals['units'] for pk, totals in products.items()}, IntegerField()
+            )
+        )
+
+
+def apply_sales_deltas():
+    """
+    Add the queued sales deltas to the counters and delete them, one
+    transaction per DELTAS_PER_BATCH rows. Returns the number applied.
+    
+    Only committed rows are read, and the rows read are locked, so
+    concurrent runs and checkouts still in flight are never counted twice.
+    """
+    applied = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                SalesDelta.objects.select_for_update(skip_locked=True).order_by('id').values_list(
+                    'id', 'seller_id', 'product_id', 'revenue', 'units', 'orders_count'
+                )[:DELTAS_PER_BATCH]
+            )
+            if not rows:
+                break
+            
+            sellers = defaultdict(lambda: {'revenue': Decimal(0), 'units': 0, 'orders_count': 0})
+            products = defaultdict(lambda: {'revenue': Decimal(0), 'units': 0})
+            for _, seller_id, product_id, revenue, units, orders_count in rows:
+                seller = sellers[seller_id]
+                seller['revenue'] += revenue
+                seller['units'] += units
+                seller['orders_count'] += orders_count
+                if product_id is not None:
+                    product = products[product_id]
+                    product['seller_id'] = seller_id
+                    product['revenue'] += revenue
+                    product['units'] += units
+            
+            _add_totals(sellers, products)
+            SalesDelta.objects.filter(id__in=[row[0] for row in rows]).delete()
+        
+        applied += len(rows)
+        if len(rows) < DELTAS_PER_BATCH:
+            break
+    return applied
+
+
+def rebuild_sales():
+    """Recompute every seller and product counter from the live and archived orders"""
+    sellers = defaultdict(lambda: {'revenue': Decimal(0), 'units': 0, 'orders_count': 0})
+    products = defaultdict(lambda: {'revenue': Decimal(0), 'units': 0})
+    
+    with transaction.atomic():
+        # The orders read below already include every committed delta
+        SalesDelta.objects.all().delete()
+        for item_model in (OrderItem, ArchivedOrderItem):
+            items = item_model.objects.filter(seller__isnull=False).exclude(
+                order__status__in=EXCLUDED_STATUSES
+            )
+            for row in items.values('seller_id').annotate(
+                total_revenue=Sum(F('product_price') * F('quantity')),
+                total_units=Sum('quantity'),
+                total_orders=Count('order', distinct=True)
+            ).order_by():
+                seller = sellers[row['seller_id']]
+                seller['revenue'] += row['total_revenue']
+                seller['units'] += row['total_units']
+                # An order is either live or archived, so the counts add up
+                seller['orders_count'] += row['total_orders']
+            
+            for row in items.filter(product__isnull=False).values('product_id', 'seller_id').annotate(
+                total_revenue=Sum(F('product_price') * F('quantity')),
+                total_units=Sum('quantity')
+            ).order_by():
+                product = products[row['product_id']]
+                product['seller_id'] = row['seller_id']
+                product['revenue'] += row['total_revenue']
+                product['units'] += row['total_units']
+        
+        SellerSales.objects.all().delete()
+        ProductSales.objects.all().delete()
+        SellerSales.objects.bulk_create([
+            SellerSales(seller_id=pk, **totals) for pk, totals in sellers.items()
+        ], batch_size=1000)
+        ProductSales.objects.bulk_create([
+            ProductSales(product_id=pk, **totals) for pk, totals in products.items()
+        ], batch_size=1000)
+    
+    return len(sellers)
@@ -0,0 +1,178 @@
+from datetime import datetime, time, timedelta
+
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from products.models import Category, Product
+from .models import SalesRollup
+from .serializers import SalesRollupSerializer
+
+User = get_user_model()
+
+# Longest range served from hourly rollups, in days
+MAX_HOURLY_RANGE_DAYS = 31
+
+
+class IsAdmin(permissions.BasePermission):
+    """Permission class for admins"""
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.role == 'admin'
+
+
+def _date_range(request, default_days=30):
+    """
+    Read the inclusive ``start`` and ``end`` dates (YYYY-MM-DD) of the query.
+    Returns (start, end, error) with start and end as the moments bounding
+    the range, end excluded.
+    """
+    today = timezone.localdate()
+    try:
+        end = parse_date(request.query_params.get('end', '')) or today
+        start = parse_date(request.query_params.get('start', '')) or end - timedelta(days=default_days - 1)
+    except ValueError:
+        return None, None, 'start and end must be valid dates (YYYY-MM-DD).'
+    if start > end:
+        return None, None, 'start must not be after end.'
+    
+    start = timezone.make_aware(datetime.combine(start, time.min))
+    end = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    return start, end, None
+
+
+def _totals(rollups):
+    totals = rollups.aggregate(
+        total_revenue=Sum('revenue'),
+        total_orders=Sum('orders_count'),
+        total_units=Sum('units')
+    )
+    return {
+        'revenue': totals['total_revenue'] or 0,
+        'orders_count': totals['total_orders'] or 0,
+        'units': totals['total_units'] or 0,
+    }
+
+
+class SalesSeriesView(APIView):
+    """Hourly or daily sales over a date range, overall or for one product, category or seller"""
+    permission_classes = [IsAdmin]
+    
+    def get(self, request):
+        period = request.query_params.get('period', 'day')
+        dimension = request.query_params.get('dimension', 'total')
+        if period not in dict(SalesRollup.PERIOD_CHOICES):
+            return Response({
+                'error': 'period must be hour or day.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if dimension not in dict(SalesRollup.DIMENSION_CHOICES):
+            return Response({
+                'error': 'dimension must be total, product, category or seller.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        key = 0
+        if dimension != 'total':
+            try:
+                key = int(request.query_params['key'])
+            except (KeyError, ValueError):
+                return Response({
+                    'error': f'key must be the id of the {dimension}.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        start, end, error = _date_range(request)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        if period == 'hour' and end - start > timedelta(days=MAX_HOURLY_RANGE_DAYS):
+            return Response({
+                'error': f'Hourly sales are limited to {MAX_HOURLY_RANGE_DAYS} days.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        rollups = SalesRollup.objects.filter(
+            period=period,
+            dimension=dimension,
+            key=key,
+            bucket__gte=start,
+            bucket__lt=end
+        ).order_by('bucket')
+        
+        return Response({
+            'period': period,
+            'dimension': dimension,
+            'key': key,
+            'start': start,
+            'end': end,
+            'totals': _totals(rollups),
+            'results': SalesRollupSerializer(rollups, many=True).data,
+        })
+
+
+class SalesTopView(APIView):
+    """Best selling products, categories or sellers over a date range"""
+    permission_classes = [IsAdmin]
+    
+    # Rollup dimension -> (model, field used as the name)
+    NAMES = {
+        'product': (Product, 'title'),
+        'category': (Category, 'name'),
+        'seller': (User, 'email'),
+    }
+    
+    def get(self, request):
+        dimension = request.query_params.get('dimension', 'product')
+        order_by = request.query_params.get('order_by', 'revenue')
+        if dimension not in self.NAMES:
+            return Response({
+                'error': 'dimension must be product, category or seller.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if order_by not in ['revenue', 'units', 'orders_count']:
+            return Response({
+                'error': 'order_by must be revenue, units or orders_count.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response({
+                'error': 'limit must be a number.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        start, end, error = _date_range(request)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rows = list(
+            SalesRollup.objects.filter(
+                period='day',
+                dimension=dimension,
+                bucket__gte=start,
+                bucket__lt=end
+            ).values('key').annotate(
+                total_revenue=Sum('revenue'),
+                total_orders_count=Sum('orders_count'),
+                total_units=Sum('units')
+            ).order_by(f'-total_{order_by}', 'key')[:limit]
+        )
+        
+        model, name_field = self.NAMES[dimension]
+        names = dict(
+            model.objects.filter(pk__in=[row['key'] for row in rows]).values_list('pk', name_field)
+        )
+        results = [
+            {
+                'key': row['key'],
+                'name': names.get(row['key']),
+                'revenue': row['total_revenue'],
+                'orders_count': row['total_orders_count'],
+                'units': row['total_units'],
+            }
+            for row in rows
+        ]
+        
+        return Response({
+            'dimension': dimension,
+            'start': start,
+            'end': end,
+            'results': results,
+        })
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Sum
 from .models import Cart, CartItem
 
 
@@ -18,9 +19,14 @@ class CartAdmin(admin.ModelAdmin):
     search_fields = ['user__email', 'session_id']
     ordering = ['-updated_at']
     inlines = [CartItemInline]
+    list_select_related = ['user']
+    
+    def get_queryset(self, request):
+        # Count items in the changelist query instead of once per row
+        return super().get_queryset(request).annotate(items_count=Sum('items__quantity'))
     
     def get_items_count(self, obj):
-        return obj.get_items_count()
+        return obj.items_count or 0
     get_items_count.short_description = 'Items Count'
 
 
@@ -31,3 +37,4 @@ class CartItemAdmin(admin.ModelAdmin):
     list_filter = ['added_at']
     search_fields = ['product__title', 'cart__user__email']
     ordering = ['-added_at']
+    list_select_related = ['cart__user', 'product']
@@ -0,0 +1,34 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from cart.utils.storage import get_cart_store
+
+
+class Command(BaseCommand):
+    help = 'Write carts changed in the cache back to the database (CART_STORAGE=cache)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Maximum number of carts written per batch')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running, flushing every INTERVAL seconds')
+    
+    def handle(self, *args, **options):
+        if settings.CART_STORAGE != 'cache':
+            raise CommandError('CART_STORAGE is not set to "cache", nothing to flush.')
+        
+        store = get_cart_store()
+        while True:
+            total = 0
+            while True:
+                flushed = store.flush_pending(batch_size=options['batch_size'])
+                if not flushed and not store.has_pending():
+                    break
+                total += flushed
+            
+            if total:
+                self.stdout.write(self.style.SUCCESS(f'Flushed {total} carts.'))
+            
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,74 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from cart.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = 'Delete carts idle for longer than CART_STALE_AFTER_DAYS, in primary-key chunks'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CART_STALE_AFTER_DAYS,
+                            help='Delete carts not updated for this many days')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of carts deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=0.1,
+                            help='Seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be deleted')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running, sweeping every INTERVAL seconds')
+    
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+            carts = Cart.objects.filter(updated_at__lt=cutoff).count()
+            items = CartItem.objects.filter(cart__updated_at__lt=cutoff).count()
+            self.stdout.write(f'Would delete {carts} carts and {items} cart items.')
+            return
+        
+        while True:
+            self.sweep(options)
+            
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+    
+    def sweep(self, options):
+        """Delete the carts that are stale now, one batch per transaction"""
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        stale = Cart.objects.filter(updated_at__lt=cutoff)
+        deleted_carts = 0
+        deleted_items = 0
+        last_pk = 0
+        while True:
+            cart_ids = list(
+                stale.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not cart_ids:
+                break
+            last_pk = cart_ids[-1]
+            
+            with transaction.atomic():
+                # Re-check the age so carts used since the scan are kept
+                cart_ids = list(
+                    Cart.objects.select_for_update().filter(pk__in=cart_ids, updated_at__lt=cutoff)
+                    .values_list('pk', flat=True)
+                )
+                items, _ = CartItem.objects.filter(cart_id__in=cart_ids).delete()
+                _, deleted = Cart.objects.filter(pk__in=cart_ids).delete()
+                carts = deleted.get(Cart._meta.label, 0)
+            
+            deleted_items += items
+            deleted_carts += carts
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Deleted {carts} carts up to id {last_pk}.')
+            time.sleep(options['sleep'])
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted_carts} stale carts and {deleted_items} cart items '
+            f'(idle for more than {options["days"]} days).'
+        ))
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:26
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_carts(apps, schema_editor):
+    """Keep only the most recently updated cart of each user"""
+    Cart = apps.get_model('cart', 'Cart')
+    duplicated_users = (
+        Cart.objects.filter(user__isnull=False)
+        .values('user').annotate(carts=Count('id')).filter(carts__gt=1)
+        .values_list('user', flat=True)
+    )
+    for user_id in duplicated_users:
+        stale_ids = list(
+            Cart.objects.filter(user_id=user_id)
+            .order_by('-updated_at').values_list('id', flat=True)[1:]
+        )
+        Cart.objects.filter(id__in=stale_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_carts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user',), name='unique_cart_per_user'),
+        ),
+    ]
@@ -1,7 +1,61 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import F, Sum, Value, Prefetch, ExpressionWrapper, DecimalField
+from django.db.models.functions import Round
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from products.models import Product
+from products.models import Product, ProductImage, StockReservation
+
+
+def discounted_price_expression(prefix=''):
+    """
+    Database expression for a product's price after its discount, rounded to
+    cents like Product.get_discounted_price so stored unit prices compare equal
+    """
+    price = F(f'{prefix}price')
+    # Multiply by 0.01 instead of dividing by 100, SQLite divides whole numbers as integers
+    return Round(
+        price - price * F(f'{prefix}discount') * Value(Decimal('0.01')),
+        2,
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+
+
+def item_subtotal_expression(prefix=''):
+    """Database expression for quantity times discounted price of cart items"""
+    return ExpressionWrapper(
+        F(f'{prefix}quantity') * discounted_price_expression(f'{prefix}product__'),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+
+
+def cart_items_prefetch():
+    """Prefetch for cart items with everything the cart serializers render"""
+    return Prefetch(
+        'items',
+        queryset=CartItem.objects.select_related(
+            'product__category', 'product__brand', 'product__seller'
+        ).prefetch_related(
+            Prefetch(
+                'product__images',
+                queryset=ProductImage.objects.filter(is_primary=True),
+                to_attr='primary_images'
+            ),
+            Prefetch(
+                'product__reservations',
+                queryset=StockReservation.objects.filter(expires_at__gt=timezone.now()),
+                to_attr='active_reservations'
+            )
+        )
+    )
+
+
+class CartQuerySet(models.QuerySet):
+    """Cart QuerySet"""
+    def with_items(self):
+        """Load items and their products in one prefetched pass"""
+        return self.prefetch_related(cart_items_prefetch())
 
 
 class Cart(models.Model):
@@ -14,26 +68,87 @@ class Cart(models.Model):
         blank=True
     )
     session_id = models.CharField(max_length=255, null=True, blank=True)  # For guest users
+    version = models.PositiveIntegerField(default=0)  # Bumped by every change to the items
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CartQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('cart')
         verbose_name_plural = _('carts')
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
+        constraints = [
+            # One cart per user, so concurrent get_or_create calls can't create two
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(user__isnull=False),
+                name='unique_cart_per_user'
+            ),
+        ]
     
     def __str__(self):
         if self.user:
             return f"Cart for {self.user.email}"
         return f"Guest Cart {self.session_id}"
     
+    def has_prefetched_items(self):
+        """Check if items were already loaded with the cart"""
+        return 'items' in getattr(self, '_prefetched_objects_cache', {})
+    
+    def set_prefetched_items(self, items):
+        """Attach already-loaded items so they are not queried again"""
+        # Guest carts are never saved, so there is no cart to filter on
+        queryset = CartItem.objects.filter(cart=self) if self.pk else CartItem.objects.none()
+        queryset._result_cache = list(items)
+        queryset._prefetch_done = True
+        self._prefetched_objects_cache = {'items': queryset}
+    
+    def get_items(self):
+        """Get cart items, reusing prefetched or attached rows"""
+        if self.has_prefetched_items():
+            return self._prefetched_objects_cache['items']
+        return self.items.all()
+    
     def get_total(self):
         """Calculate total cart amount"""
-        return sum(item.get_subtotal() for item in self.items.all())
+        if self.has_prefetched_items():
+            return sum((item.get_subtotal() for item in self.get_items()), Decimal('0'))
+        return self.items.aggregate(total=Sum(item_subtotal_expression()))['total'] or Decimal('0')
     
     def get_items_count(self):
         """Get total number of items in cart"""
-        return sum(item.quantity for item in self.items.all())
+        if self.has_prefetched_items():
+            return sum(item.quantity for item in self.get_items())
+        return self.items.aggregate(count=Sum('quantity'))['count'] or 0
+    
+    def get_summary(self):
+        """Get total, items count and current version, in one query if items aren't loaded"""
+        if self.has_prefetched_items():
+            return {
+                'total': self.get_total(),
+                'items_count': self.get_items_count(),
+                'version': self.version,
+            }
+        summary = Cart.objects.filter(pk=self.pk).annotate(
+            total=Sum(item_subtotal_expression('items__')),
+            items_count=Sum('items__quantity')
+        ).values('total', 'items_count', 'version').get()
+        return {
+            'total': summary['total'] or Decimal('0'),
+            'items_count': summary['items_count'] or 0,
+            'version': summary['version'],
+        }
+    
+    def touch(self):
+        """Record a change to the items: bump the version and updated_at"""
+        now = timezone.now()
+        Cart.objects.filter(pk=self.pk).update(version=F('version') + 1, updated_at=now)
+        self.version += 1
+        self.updated_at = now
 
 
 class CartItem(models.Model):
@@ -41,6 +156,8 @@ class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=1)
+    # Discounted product price when the line was last changed, see validate_cart
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     added_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -17,16 +17,29 @@ class CartItemSerializer(serializers.ModelSerializer):
         return float(obj.get_subtotal())
 
 
+class CartItemDeltaSerializer(serializers.ModelSerializer):
+    """Cart Item Serializer for delta responses (no nested product)"""
+    subtotal = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = CartItem
+        fields = ['id', 'product_id', 'quantity', 'subtotal']
+        read_only_fields = fields
+    
+    def get_subtotal(self, obj):
+        return float(obj.get_subtotal())
+
+
 class CartSerializer(serializers.ModelSerializer):
     """Cart Serializer"""
-    items = CartItemSerializer(many=True, read_only=True)
+    items = CartItemSerializer(source='get_items', many=True, read_only=True)
     total = serializers.SerializerMethodField()
     items_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Cart
-        fields = ['id', 'items', 'total', 'items_count', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'items', 'total', 'items_count', 'version', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'version', 'created_at', 'updated_at']
     
     def get_total(self, obj):
         return float(obj.get_total())
@@ -44,3 +57,35 @@ class AddToCartSerializer(serializers.Serializer):
 class UpdateCartItemSerializer(serializers.Serializer):
     """Update Cart Item Serializer"""
     quantity = serializers.IntegerField(min_value=1)
+
+
+class CartOperationSerializer(serializers.Serializer):
+    """Single operation of a batch cart update"""
+    OPERATION_CHOICES = (
+        ('add', 'Add product'),
+        ('update', 'Update item quantity'),
+        ('remove', 'Remove item'),
+    )
+    
+    op = serializers.ChoiceField(choices=OPERATION_CHOICES)
+    product_id = serializers.IntegerField(required=False)
+    item_id = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(min_value=1, required=False)
+    
+    def validate(self, attrs):
+        op = attrs['op']
+        if op == 'add':
+            if 'product_id' not in attrs:
+                raise serializers.ValidationError("product_id is required for 'add'.")
+            attrs.setdefault('quantity', 1)
+        else:
+            if 'item_id' not in attrs:
+                raise serializers.ValidationError(f"item_id is required for '{op}'.")
+            if op == 'update' and 'quantity' not in attrs:
+                raise serializers.ValidationError("quantity is required for 'update'.")
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    """Batch Cart Update Serializer"""
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
@@ -1,3 +1,72 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from products.models import Brand, Category, Product
+from users.models import User
+from .models import CartItem
+from .utils.storage import get_cart_store
+
+
+@override_settings(CART_STORAGE='cache')
+class FlushCartCacheTests(TestCase):
+    """Carts changed in the cache reach the database through flush_cart_cache"""
+    
+    def setUp(self):
+        cache.clear()
+        seller = User.objects.create_user(
+            email='seller@example.com', username='seller@example.com',
+            password='testpass123!', role='seller', is_active=True
+        )
+        self.customer = User.objects.create_user(
+            email='customer@example.com', username='customer@example.com',
+            password='testpass123!', is_active=True
+        )
+        category = Category.objects.create(name='Books')
+        brand = Brand.objects.create(name='Press')
+        self.products = [
+            Product.objects.create(
+                title=f'Book {i}', description='A book', price='10.00', stock_quantity=10,
+                category=category, brand=brand, seller=seller
+            )
+            for i in range(2)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+    
+    def add(self, product, quantity):
+        response = self.client.post('/api/cart/add/', {'product_id': product.pk, 'quantity': quantity})
+        self.assertEqual(response.status_code, 200)
+        return CartItem.objects.get(cart__user=self.customer, product=product)
+    
+    def saved_quantities(self):
+        return dict(
+            CartItem.objects.filter(cart__user=self.customer).values_list('product_id', 'quantity')
+        )
+    
+    def test_flush_persists_dirty_carts(self):
+        kept, removed = self.products
+        kept_item = self.add(kept, 1)
+        removed_item = self.add(removed, 1)
+        
+        self.client.put(f'/api/cart/items/{kept_item.pk}/update/', {'quantity': 4})
+        self.client.delete(f'/api/cart/items/{removed_item.pk}/remove/')
+        # Quantity changes and removals only touch the cache
+        self.assertEqual(self.saved_quantities(), {kept.pk: 1, removed.pk: 1})
+        self.assertTrue(get_cart_store().has_pending())
+        
+        call_command('flush_cart_cache', stdout=StringIO())
+        
+        self.assertEqual(self.saved_quantities(), {kept.pk: 4})
+        self.assertFalse(get_cart_store().has_pending())
+    
+    def test_flushed_cart_is_not_written_again(self):
+        item = self.add(self.products[0], 1)
+        self.client.put(f'/api/cart/items/{item.pk}/update/', {'quantity': 2})
+        call_command('flush_cart_cache', stdout=StringIO())
+        
+        self.assertEqual(get_cart_store().flush_pending(), 0)
+        self.assertEqual(self.saved_quantities(), {self.products[0].pk: 2})
@@ -5,6 +5,8 @@ from .views import (
     UpdateCartItemView,
     RemoveCartItemView,
     ClearCartView,
+    CartBatchView,
+    ValidateCartView,
 )
 
 app_name = 'cart'
@@ -15,4 +17,6 @@ urlpatterns = [
     path('items/<int:item_id>/update/', UpdateCartItemView.as_view(), name='update_cart_item'),
     path('items/<int:item_id>/remove/', RemoveCartItemView.as_view(), name='remove_cart_item'),
     path('clear/', ClearCartView.as_view(), name='clear_cart'),
+    path('batch/', CartBatchView.as_view(), name='cart_batch'),
+    path('validate/', ValidateCartView.as_view(), name='validate_cart'),
 ]
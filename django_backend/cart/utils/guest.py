@@ -0,0 +1,200 @@
+"""
+Guest carts.
+
+Anonymous carts live entirely in a signed cookie holding the cart version
+and ``product_id-quantity`` pairs, so browsing and adding to the cart as a guest
+never writes to the database. Guest lines use the product id as their item
+id. On login the guest cart is merged into the user's ``Cart``.
+"""
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from products.models import Product
+from ..models import Cart, CartItem, discounted_price_expression
+from .storage import CartError, InsufficientStock, attach_items, get_cart_store, plan_batch
+
+COOKIE_SALT = 'cart.guest'
+
+
+def read_guest_cart(request):
+    """Return the guest cart version and its lines as an ordered {product_id: quantity} dict"""
+    pending = getattr(request, 'guest_cart', None)
+    if pending is not None:
+        version, lines = pending
+        return version, dict(lines)
+    
+    value = request.get_signed_cookie(
+        settings.GUEST_CART_COOKIE_NAME,
+        default=None,
+        salt=COOKIE_SALT,
+        max_age=settings.GUEST_CART_COOKIE_AGE
+    )
+    if not value:
+        return 0, {}
+    try:
+        version, pairs = value.split(':', 1)
+        lines = {}
+        for pair in filter(None, pairs.split('.')):
+            product_id, quantity = pair.split('-')
+            lines[int(product_id)] = int(quantity)
+        return int(version), lines
+    except ValueError:
+        return 0, {}
+
+
+def write_guest_cart(response, version, lines):
+    """Set the guest cart cookie on a response"""
+    pairs = '.'.join(f'{product_id}-{quantity}' for product_id, quantity in lines.items())
+    response.set_signed_cookie(
+        settings.GUEST_CART_COOKIE_NAME,
+        f'{version}:{pairs}',
+        salt=COOKIE_SALT,
+        max_age=settings.GUEST_CART_COOKIE_AGE,
+        httponly=True,
+        samesite='Lax',
+        secure=not settings.DEBUG
+    )
+
+
+class GuestCartStore:
+    """
+    Cart store for anonymous users. Changes are kept on the request and
+    written to the cookie by ``GuestCartCookieMixin`` once the view returns.
+    """
+    
+    def _save(self, request, version, lines):
+        request.guest_cart = (version + 1, lines)
+    
+    def _stock_quantity(self, product_id):
+        try:
+            return Product.objects.with_effective_stock().values_list(
+                'effective_stock', flat=True
+            ).get(pk=product_id, is_approved=True, is_active=True)
+        except Product.DoesNotExist:
+            raise Http404('No CartItem matches the given query.')
+    
+    def get_cart(self, request):
+        version, lines = read_guest_cart(request)
+        now = timezone.now()
+        cart = Cart(version=version, created_at=now, updated_at=now)
+        # Most recently added first, like CartItem's default ordering
+        return attach_items(cart, [
+            (product_id, product_id, quantity, None)
+            for product_id, quantity in reversed(lines.items())
+        ])
+    
+    def add_item(self, request, product_id, quantity):
+        product = get_object_or_404(
+            Product.objects.with_effective_stock(), id=product_id, is_approved=True, is_active=True
+        )
+        version, lines = read_guest_cart(request)
+        new_quantity = lines.get(product.pk, 0) + quantity
+        
+        if product.effective_stock < new_quantity:
+            raise InsufficientStock(product.effective_stock)
+        if product.pk not in lines and len(lines) >= settings.GUEST_CART_MAX_ITEMS:
+            raise CartError(f'A guest cart can hold at most {settings.GUEST_CART_MAX_ITEMS} products.')
+        
+        lines[product.pk] = new_quantity
+        self._save(request, version, lines)
+        return self.get_cart(request)
+    
+    def update_item(self, request, item_id, quantity):
+        version, lines = read_guest_cart(request)
+        if item_id not in lines:
+            raise Http404('No CartItem matches the given query.')
+        
+        stock_quantity = self._stock_quantity(item_id)
+        if stock_quantity < quantity:
+            raise InsufficientStock(stock_quantity)
+        
+        lines[item_id] = quantity
+        self._save(request, version, lines)
+        return self.get_cart(request)
+    
+    def remove_item(self, request, item_id):
+        version, lines = read_guest_cart(request)
+        if item_id not in lines:
+            raise Http404('No CartItem matches the given query.')
+        
+        del lines[item_id]
+        self._save(request, version, lines)
+        return self.get_cart(request)
+    
+    def apply_batch(self, request, operations):
+        version, lines = read_guest_cart(request)
+        quantities, prices = plan_batch(
+            lines, {product_id: product_id for product_id in lines}, operations
+        )
+        if len(quantities) > settings.GUEST_CART_MAX_ITEMS:
+            raise CartError(f'A guest cart can hold at most {settings.GUEST_CART_MAX_ITEMS} products.')
+        self._save(request, version, quantities)
+        return self.get_cart(request)
+    
+    def clear(self, request):
+        version, lines = read_guest_cart(request)
+        self._save(request, version, {})
+        return bool(lines)
+
+
+guest_cart_store = GuestCartStore()
+
+
+class GuestCartCookieMixin:
+    """Write guest cart changes made during the request to the cookie"""
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        pending = getattr(request, 'guest_cart', None)
+        if pending is not None:
+            write_guest_cart(response, *pending)
+        return response
+
+
+def merge_guest_cart(request, user):
+    """
+    Merge the requesting guest's cart into the user's cart with a single
+    bulk upsert. Quantities are added up and capped at the available stock.
+    Returns True if there was anything to merge.
+    """
+    version, lines = read_guest_cart(request)
+    if not lines:
+        return False
+    
+    store = get_cart_store()
+    store.persist(user)
+    
+    cart, created = Cart.objects.get_or_create(user=user)
+    products = {
+        product_id: (stock_quantity, price)
+        for product_id, stock_quantity, price in Product.objects.filter(
+            id__in=lines, is_approved=True, is_active=True
+        ).with_effective_stock().annotate(
+            discounted_price=discounted_price_expression()
+        ).values_list('id', 'effective_stock', 'discounted_price')
+    }
+    existing = dict(cart.items.filter(product_id__in=products).values_list('product_id', 'quantity'))
+    
+    merged = []
+    for product_id, quantity in lines.items():
+        if product_id not in products:
+            continue
+        stock_quantity, price = products[product_id]
+        quantity = min(existing.get(product_id, 0) + quantity, stock_quantity)
+        if quantity > 0:
+            merged.append(
+                CartItem(cart=cart, product_id=product_id, quantity=quantity, unit_price=price)
+            )
+    
+    if merged:
+        CartItem.objects.bulk_create(
+            merged,
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['quantity', 'unit_price', 'updated_at']
+        )
+        cart.touch()
+    store.invalidate(user)
+    return True
@@ -0,0 +1,633 @@
+"""
+Cart storage backends.
+
+``DatabaseCartStore`` reads and writes ``Cart``/``CartItem`` rows directly.
+``CacheCartStore`` keeps the cart of active users in the cache backend and
+writes changes back to the database in batches (see the ``flush_cart_cache``
+management command). Select one with the ``CART_STORAGE`` setting.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import OuterRef, Prefetch, Subquery
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from products.models import Product, ProductImage, StockReservation, StockShard
+from ..models import Cart, CartItem, discounted_price_expression
+
+
+class CartError(Exception):
+    """A cart change that can't be applied"""
+
+
+class InsufficientStock(CartError):
+    """Requested quantity exceeds the product's stock"""
+    def __init__(self, available):
+        self.available = available
+        super().__init__(f'Only {available} items available in stock.')
+
+
+class CartBatchError(CartError):
+    """One or more operations of a batch can't be applied"""
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('Some cart operations could not be applied.')
+
+
+def plan_batch(quantities, item_products, operations):
+    """
+    Apply batch operations to a copy of the cart's {product_id: quantity}
+    lines and validate the result with one product query.
+    
+    ``item_products`` maps the ids clients use for existing items to product
+    ids. Returns the new lines and the current discounted price of every
+    product whose line was added or set, or raises CartBatchError listing
+    every operation that can't be applied.
+    """
+    quantities = dict(quantities)
+    errors = []
+    added = set()
+    changed = set()
+    
+    for index, operation in enumerate(operations):
+        if operation['op'] == 'add':
+            product_id = operation['product_id']
+            quantities[product_id] = quantities.get(product_id, 0) + operation['quantity']
+            added.add(product_id)
+            changed.add(product_id)
+            continue
+        
+        product_id = item_products.get(operation['item_id'])
+        if product_id is None or product_id not in quantities:
+            errors.append({'index': index, 'error': 'Cart item not found.'})
+        elif operation['op'] == 'update':
+            quantities[product_id] = operation['quantity']
+            changed.add(product_id)
+        else:
+            del quantities[product_id]
+    
+    # Validate availability and stock of every product whose line grew or was set
+    checked = changed & set(quantities)
+    products = Product.objects.filter(id__in=checked).with_effective_stock().annotate(
+        discounted_price=discounted_price_expression()
+    ).values_list('id', 'effective_stock', 'is_approved', 'is_active', 'discounted_price')
+    prices = {}
+    for product_id, stock_quantity, is_approved, is_active, price in products:
+        prices[product_id] = price
+        if product_id in added and not (is_approved and is_active):
+            errors.append({'product_id': product_id, 'error': 'Product not found.'})
+        elif stock_quantity < quantities[product_id]:
+            errors.append({
+                'product_id': product_id,
+                'error': f'Only {stock_quantity} items available in stock.'
+            })
+    for product_id in checked - set(prices):
+        errors.append({'product_id': product_id, 'error': 'Product not found.'})
+    
+    if errors:
+        raise CartBatchError(errors)
+    return quantities, prices
+
+
+def attach_items(cart, lines):
+    """
+    Attach unsaved CartItems built from (item_id, product_id, quantity, added_at)
+    lines to a cart, loading all their products in one query.
+    """
+    lines = list(lines)
+    products = Product.objects.select_related('category', 'brand', 'seller').prefetch_related(
+        Prefetch(
+            'images',
+            queryset=ProductImage.objects.filter(is_primary=True),
+            to_attr='primary_images'
+        ),
+        Prefetch(
+            'reservations',
+            queryset=StockReservation.objects.filter(expires_at__gt=timezone.now()),
+            to_attr='active_reservations'
+        )
+    ).in_bulk([product_id for item_id, product_id, quantity, added_at in lines])
+    
+    cart.set_prefetched_items([
+        CartItem(
+            id=item_id,
+            cart=cart,
+            product=products[product_id],
+            quantity=quantity,
+            added_at=added_at
+        )
+        for item_id, product_id, quantity, added_at in lines
+        if product_id in products
+    ])
+    return cart
+
+
+class DatabaseCartStore:
+    """Cart store backed directly by the database"""
+    
+    def get_cart(self, request):
+        cart, created = Cart.objects.get_or_create(user=request.user)
+        return cart
+    
+    # Inserts the line, or adds to its quantity, only while the product is
+    # available and has enough stock (including shards) for the resulting
+    # quantity. Works on SQLite (3.35+) and PostgreSQL.
+    UPSERT_SQL = """
+        INSERT INTO {item_table} (cart_id, product_id, quantity, unit_price, added_at, updated_at)
+        SELECT %s, p.id, %s, p.price - p.price * p.discount * 0.01, %s, %s
+        FROM {product_table} p
+        WHERE p.id = %s AND p.is_approved = %s AND p.is_active = %s
+            AND p.stock_quantity + COALESCE(
+                (SELECT SUM(s.quantity) FROM {shard_table} s WHERE s.product_id = p.id), 0
+            ) >= %s
+        ON CONFLICT (cart_id, product_id) DO UPDATE
+        SET quantity = {item_table}.quantity + excluded.quantity,
+            unit_price = excluded.unit_price,
+            updated_at = excluded.updated_at
+        WHERE {item_table}.quantity + excluded.quantity <= (
+            SELECT p.stock_quantity + COALESCE(
+                (SELECT SUM(s.quantity) FROM {shard_table} s WHERE s.product_id = p.id), 0
+            )
+            FROM {product_table} p WHERE p.id = excluded.product_id
+        )
+        RETURNING id
+    """
+    
+    def _stock_error(self, product_id):
+        """Find out why a conditional write matched no row"""
+        product = get_object_or_404(
+            Product.objects.with_effective_stock(), id=product_id, is_approved=True, is_active=True
+        )
+        return InsufficientStock(product.effective_stock)
+    
+    @transaction.atomic
+    def add_item(self, request, product_id, quantity):
+        cart = self.get_cart(request)
+        
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        sql = self.UPSERT_SQL.format(
+            item_table=CartItem._meta.db_table,
+            product_table=Product._meta.db_table,
+            shard_table=StockShard._meta.db_table
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [cart.pk, quantity, now, now, product_id, True, True, quantity])
+            row = cursor.fetchone()
+        
+        if row is None:
+            raise self._stock_error(product_id)
+        cart.touch()
+        return cart
+    
+    @transaction.atomic
+    def update_item(self, request, item_id, quantity):
+        cart = self.get_cart(request)
+        
+        unit_price = Product.objects.filter(pk=OuterRef('product_id')).annotate(
+            discounted_price=discounted_price_expression()
+        ).values('discounted_price')[:1]
+        updated = CartItem.objects.filter(
+            id=item_id,
+            cart=cart,
+            product__in=Product.objects.with_effective_stock().filter(effective_stock__gte=quantity)
+        ).update(quantity=quantity, unit_price=Subquery(unit_price), updated_at=timezone.now())
+        
+        if not updated:
+            cart_item = get_object_or_404(
+                CartItem.objects.select_related('product'),
+                id=item_id,
+                cart=cart
+            )
+            raise InsufficientStock(cart_item.product.get_effective_stock())
+        cart.touch()
+        return cart
+    
+    @transaction.atomic
+    def remove_item(self, request, item_id):
+        cart = self.get_cart(request)
+        deleted, _ = CartItem.objects.filter(id=item_id, cart=cart).delete()
+        if not deleted:
+            raise Http404('No CartItem matches the given query.')
+        cart.touch()
+        return cart
+    
+    def apply_batch(self, request, operations):
+        cart = self.get_cart(request)
+        
+        with transaction.atomic():
+            current = list(
+                cart.items.select_for_update().values_list('id', 'product_id', 'quantity')
+            )
+            quantities, prices = plan_batch(
+                {product_id: quantity for item_id, product_id, quantity in current},
+                {item_id: product_id for item_id, product_id, quantity in current},
+                operations
+            )
+            
+            removed = [
+                product_id for item_id, product_id, quantity in current
+                if product_id not in quantities
+            ]
+            if removed:
+                CartItem.objects.filter(cart=cart, product_id__in=removed).delete()
+            
+            unchanged = {(product_id, quantity) for item_id, product_id, quantity in current}
+            lines = [
+                CartItem(
+                    cart=cart,
+                    product_id=product_id,
+                    quantity=quantity,
+                    unit_price=prices.get(product_id)
+                )
+                for product_id, quantity in quantities.items()
+                if (product_id, quantity) not in unchanged
+            ]
+            if lines:
+                CartItem.objects.bulk_create(
+                    lines,
+                    update_conflicts=True,
+                    unique_fields=['cart', 'product'],
+                    update_fields=['quantity', 'unit_price', 'updated_at']
+                )
+            cart.touch()
+        return cart
+    
+    def clear(self, request):
+        """Remove all items, returning False if the user has no cart"""
+        try:
+            cart = Cart.objects.get(user=request.user)
+        except Cart.DoesNotExist:
+            return False
+        cart.items.all().delete()
+        cart.touch()
+        return True
+    
+    def persist(self, user):
+        """Nothing to do, every change is written immediately"""
+    
+    def invalidate(self, user):
+        """Nothing to do, there is no copy outside the database"""
+
+
+class CacheCartStore:
+    """
+    Write-behind cart store.
+    
+    Each active cart is one cache entry holding item quantities keyed by
+    product id. New lines are inserted right away so that they get the id
+    the API hands out; quantity changes, removals and clears only touch the
+    cache. The first change to a clean entry appends the user id to a
+    dirty queue made of numbered cache keys, which ``flush_pending`` drains
+    in batches.
+    """
+    KEY_PREFIX = 'cart'
+    LOCK_TIMEOUT = 5
+    
+    def _entry_key(self, user_id):
+        return f'{self.KEY_PREFIX}:entry:{user_id}'
+    
+    def _queue_key(self, position):
+        return f'{self.KEY_PREFIX}:dirty:{position}'
+    
+    @property
+    def _head_key(self):
+        return f'{self.KEY_PREFIX}:dirty:head'
+    
+    @property
+    def _tail_key(self):
+        return f'{self.KEY_PREFIX}:dirty:tail'
+    
+    @contextmanager
+    def _lock(self, user_id):
+        """Serialize read-modify-write cycles on one user's entry"""
+        key = f'{self.KEY_PREFIX}:lock:{user_id}'
+        while not cache.add(key, 1, self.LOCK_TIMEOUT):
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            cache.delete(key)
+    
+    def _load(self, user):
+        """Return the cached entry for a user, loading it from the database on a miss"""
+        entry = cache.get(self._entry_key(user.pk))
+        if entry is not None:
+            return entry
+        
+        cart, created = Cart.objects.get_or_create(user=user)
+        entry = {
+            'cart_id': cart.pk,
+            'created_at': cart.created_at,
+            'updated_at': cart.updated_at,
+            'items': {
+                item['product_id']: {
+                    'id': item['id'],
+                    'quantity': item['quantity'],
+                    'unit_price': item['unit_price'],
+                    'added_at': item['added_at'],
+                }
+                for item in cart.items.values('id', 'product_id', 'quantity', 'unit_price', 'added_at')
+            },
+            'removed': {},
+            'version': cart.version,
+            'dirty': False,
+        }
+        cache.set(self._entry_key(user.pk), entry, settings.CART_CACHE_TIMEOUT)
+        return entry
+    
+    def _save(self, user, entry, dirty=True):
+        entry['version'] += 1
+        entry['updated_at'] = timezone.now()
+        if dirty and not entry['dirty']:
+            entry['dirty'] = True
+            self._enqueue(user.pk)
+        cache.set(self._entry_key(user.pk), entry, settings.CART_CACHE_TIMEOUT)
+    
+    def _enqueue(self, user_id):
+        cache.add(self._tail_key, 0, None)
+        position = cache.incr(self._tail_key)
+        cache.set(self._queue_key(position), user_id, None)
+    
+    def _build_cart(self, user, entry):
+        """Build a Cart with its items attached, ready for CartSerializer"""
+        cart = Cart(
+            id=entry['cart_id'],
+            user=user,
+            version=entry['version'],
+            created_at=entry['created_at'],
+            updated_at=entry['updated_at']
+        )
+        lines = sorted(
+            (
+                (line['id'], product_id, line['quantity'], line['added_at'])
+                for product_id, line in entry['items'].items()
+            ),
+            key=lambda line: line[3],
+            reverse=True
+        )
+        return attach_items(cart, lines)
+    
+    def _find_line(self, entry, item_id):
+        for product_id, line in entry['items'].items():
+            if line['id'] == item_id:
+                return product_id, line
+        raise Http404('No CartItem matches the given query.')
+    
+    def get_cart(self, request):
+        user = request.user
+        with self._lock(user.pk):
+            entry = self._load(user)
+        return self._build_cart(user, entry)
+    
+    def add_item(self, request, product_id, quantity):
+        user = request.user
+        product = get_object_or_404(
+            Product.objects.with_effective_stock(), id=product_id, is_approved=True, is_active=True
+        )
+        with self._lock(user.pk):
+            entry = self._load(user)
+            line = entry['items'].get(product.pk)
+            new_quantity = quantity + (line['quantity'] if line else 0)
+            
+            if product.effective_stock < new_quantity:
+                raise InsufficientStock(product.effective_stock)
+            
+            unit_price = product.get_discounted_price()
+            if line:
+                line['quantity'] = new_quantity
+                line['unit_price'] = unit_price
+                self._save(user, entry)
+            elif product.pk in entry['removed']:
+                # The row still exists in the database, bring it back
+                entry['items'][product.pk] = {
+                    'id': entry['removed'].pop(product.pk),
+                    'quantity': new_quantity,
+                    'unit_price': unit_price,
+                    'added_at': timezone.now(),
+                }
+                self._save(user, entry)
+            else:
+                cart_item = CartItem.objects.create(
+                    cart_id=entry['cart_id'],
+                    product=product,
+                    quantity=new_quantity,
+                    unit_price=unit_price
+                )
+                entry['items'][product.pk] = {
+                    'id': cart_item.pk,
+                    'quantity': new_quantity,
+                    'unit_price': cart_item.unit_price,
+                    'added_at': cart_item.added_at,
+                }
+                self._save(user, entry, dirty=False)
+        return self._build_cart(user, entry)
+    
+    def update_item(self, request, item_id, quantity):
+        user = request.user
+        with self._lock(user.pk):
+            entry = self._load(user)
+            product_id, line = self._find_line(entry, item_id)
+            
+            stock_quantity, unit_price = Product.objects.with_effective_stock().annotate(
+                discounted_price=discounted_price_expression()
+            ).values_list('effective_stock', 'discounted_price').get(pk=product_id)
+            if stock_quantity < quantity:
+                raise InsufficientStock(stock_quantity)
+            
+            line['quantity'] = quantity
+            line['unit_price'] = unit_price
+            self._save(user, entry)
+        return self._build_cart(user, entry)
+    
+    def remove_item(self, request, item_id):
+        user = request.user
+        with self._lock(user.pk):
+            entry = self._load(user)
+            product_id, line = self._find_line(entry, item_id)
+            del entry['items'][product_id]
+            entry['removed'][product_id] = line['id']
+            self._save(user, entry)
+        return self._build_cart(user, entry)
+    
+    def apply_batch(self, request, operations):
+        user = request.user
+        with self._lock(user.pk):
+            entry = self._load(user)
+            quantities, prices = plan_batch(
+                {product_id: line['quantity'] for product_id, line in entry['items'].items()},
+                {line['id']: product_id for product_id, line in entry['items'].items()},
+                operations
+            )
+            
+            for product_id in list(entry['items']):
+                if product_id not in quantities:
+                    entry['removed'][product_id] = entry['items'].pop(product_id)['id']
+            
+            new_lines = []
+            for product_id, quantity in quantities.items():
+                line = entry['items'].get(product_id)
+                if line:
+                    if product_id in prices:
+                        line['unit_price'] = prices[product_id]
+                    line['quantity'] = quantity
+                elif product_id in entry['removed']:
+                    entry['items'][product_id] = {
+                        'id': entry['removed'].pop(product_id),
+                        'quantity': quantity,
+                        'unit_price': prices.get(product_id),
+                        'added_at': timezone.now(),
+                    }
+                else:
+                    new_lines.append(CartItem(
+                        cart_id=entry['cart_id'],
+                        product_id=product_id,
+                        quantity=quantity,
+                        unit_price=prices.get(product_id)
+                    ))
+            
+            # New lines need their ids right away, insert them in one statement
+            for cart_item in CartItem.objects.bulk_create(new_lines):
+                entry['items'][cart_item.product_id] = {
+                    'id': cart_item.pk,
+                    'quantity': cart_item.quantity,
+                    'unit_price': cart_item.unit_price,
+                    'added_at': cart_item.added_at,
+                }
+            self._save(user, entry)
+        return self._build_cart(user, entry)
+    
+    def clear(self, request):
+        user = request.user
+        with self._lock(user.pk):
+            entry = self._load(user)
+            for product_id, line in entry['items'].items():
+                entry['removed'][product_id] = line['id']
+            entry['items'] = {}
+            self._save(user, entry)
+        return True
+    
+    def _write(self, entries):
+        """Write a list of (user_id, entry) snapshots to the database in one transaction"""
+        now = timezone.now()
+        lines = [
+            CartItem(
+                id=line['id'],
+                cart_id=entry['cart_id'],
+                product_id=product_id,
+                quantity=line['quantity'],
+                # Entries cached before unit prices were tracked have none
+                unit_price=line.get('unit_price'),
+                updated_at=now
+            )
+            for user_id, entry in entries
+            for product_id, line in entry['items'].items()
+        ]
+        removed_ids = [
+            item_id
+            for user_id, entry in entries
+            for item_id in entry['removed'].values()
+        ]
+        
+        with transaction.atomic():
+            if removed_ids:
+                CartItem.objects.filter(id__in=removed_ids).delete()
+            if lines:
+                # Upsert so that a line removed and re-added mid-flush is recreated
+                CartItem.objects.bulk_create(
+                    lines,
+                    update_conflicts=True,
+                    unique_fields=['cart', 'product'],
+                    update_fields=['quantity', 'unit_price', 'updated_at']
+                )
+            Cart.objects.bulk_update(
+                [
+                    Cart(id=entry['cart_id'], version=entry['version'], updated_at=entry['updated_at'])
+                    for user_id, entry in entries
+                ],
+                ['version', 'updated_at']
+            )
+    
+    def _mark_clean(self, user_id, version):
+        """Mark an entry clean unless it changed after it was snapshotted"""
+        with self._lock(user_id):
+            entry = cache.get(self._entry_key(user_id))
+            if entry is None or not entry['dirty']:
+                return
+            if entry['version'] == version:
+                entry['dirty'] = False
+                entry['removed'] = {}
+                cache.set(self._entry_key(user_id), entry, settings.CART_CACHE_TIMEOUT)
+            else:
+                self._enqueue(user_id)
+    
+    def persist(self, user):
+        """Synchronously write the user's cart to the database"""
+        with self._lock(user.pk):
+            entry = cache.get(self._entry_key(user.pk))
+            if entry is None or not entry['dirty']:
+                return
+            self._write([(user.pk, entry)])
+        # Inside a transaction (e.g. checkout) the entry must stay dirty until it commits
+        transaction.on_commit(lambda: self._mark_clean(user.pk, entry['version']))
+    
+    def invalidate(self, user):
+        """Drop the cached copy after the cart was changed in the database"""
+        cache.delete(self._entry_key(user.pk))
+    
+    def has_pending(self):
+        """Check if the dirty queue has unflushed positions"""
+        return (cache.get(self._head_key) or 0) < (cache.get(self._tail_key) or 0)
+    
+    def flush_pending(self, batch_size=500):
+        """
+        Drain one batch from the dirty queue. Returns the number of carts written.
+        """
+        cache.add(self._head_key, 0, None)
+        head = cache.get(self._head_key)
+        tail = cache.get(self._tail_key) or 0
+        if head >= tail:
+            return 0
+        
+        positions = range(head + 1, min(tail, head + batch_size) + 1)
+        queued = cache.get_many([self._queue_key(position) for position in positions])
+        user_ids = set(queued.values())
+        
+        entry_keys = {self._entry_key(user_id): user_id for user_id in user_ids}
+        entries = [
+            (entry_keys[key], entry)
+            for key, entry in cache.get_many(list(entry_keys)).items()
+            if entry['dirty']
+        ]
+        
+        if entries:
+            self._write(entries)
+            for user_id, entry in entries:
+                self._mark_clean(user_id, entry['version'])
+        
+        cache.set(self._head_key, positions[-1], None)
+        cache.delete_many(list(queued))
+        return len(entries)
+
+
+_stores = {
+    'database': DatabaseCartStore(),
+    'cache': CacheCartStore(),
+}
+
+
+def get_cart_store():
+    """Return the cart store selected by the CART_STORAGE setting"""
+    return _stores[settings.CART_STORAGE]
+
+
+def get_request_cart_store(request):
+    """Return the store holding the cart of the requesting user or guest"""
+    if request.user.is_authenticated:
+        return get_cart_store()
+    from .guest import guest_cart_store
+    return guest_cart_store
@@ -0,0 +1,83 @@
+"""
+Cart revalidation.
+
+Checks every line of a saved cart against the current product state in a
+single query: availability, stock and the discounted price compared to the
+``unit_price`` recorded when the line was last changed.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from products.models import effective_stock_expression
+from ..models import CartItem, discounted_price_expression
+
+
+def validate_cart(cart, clamp=False):
+    """
+    Return the list of discrepancies between a cart and its products.
+    
+    With ``clamp``, also fix them in the same transaction: unavailable and
+    sold out lines are removed, quantities are lowered to the stock left and
+    unit prices are set to the current price. Returns (issues, changed).
+    """
+    with transaction.atomic():
+        items = CartItem.objects.filter(cart=cart).annotate(
+            current_price=discounted_price_expression('product__'),
+            current_stock=effective_stock_expression('product__')
+        )
+        if clamp:
+            # Lock the cart's rows only, not the products they point at
+            items = items.select_for_update(of=('self',))
+        rows = items.values_list(
+            'id', 'product_id', 'quantity', 'unit_price', 'current_price',
+            'current_stock', 'product__is_approved', 'product__is_active'
+        )
+        
+        issues = []
+        removed = []
+        updated = []
+        now = timezone.now()
+        for (item_id, product_id, quantity, unit_price, current_price,
+                stock_quantity, is_approved, is_active) in rows:
+            issue = {'item_id': item_id, 'product_id': product_id}
+            new_quantity = quantity
+            
+            if not (is_approved and is_active):
+                issues.append({**issue, 'issue': 'unavailable', 'quantity': quantity})
+                new_quantity = 0
+            elif stock_quantity < quantity:
+                new_quantity = max(stock_quantity, 0)
+                issues.append({
+                    **issue,
+                    'issue': 'out_of_stock' if new_quantity == 0 else 'insufficient_stock',
+                    'quantity': quantity,
+                    'available': new_quantity,
+                })
+            
+            if new_quantity and unit_price is not None and unit_price != current_price:
+                issues.append({
+                    **issue,
+                    'issue': 'price_changed',
+                    'old_price': float(unit_price),
+                    'new_price': float(current_price),
+                })
+            
+            if new_quantity == 0:
+                removed.append(item_id)
+            elif new_quantity != quantity or unit_price != current_price:
+                updated.append(CartItem(
+                    id=item_id,
+                    quantity=new_quantity,
+                    unit_price=current_price,
+                    updated_at=now
+                ))
+        
+        changed = bool(removed or updated)
+        if clamp and changed:
+            if removed:
+                CartItem.objects.filter(id__in=removed).delete()
+            if updated:
+                CartItem.objects.bulk_update(updated, ['quantity', 'unit_price', 'updated_at'])
+            cart.touch()
+    
+    return issues, clamp and changed
@@ -1,29 +1,76 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.shortcuts import get_object_or_404
-from products.models import Product
-from .models import Cart, CartItem
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from .models import Cart, CartItem, cart_items_prefetch
 from .serializers import (
     CartSerializer,
+    CartItemDeltaSerializer,
     AddToCartSerializer,
-    UpdateCartItemSerializer
+    UpdateCartItemSerializer,
+    CartBatchSerializer
 )
+from .utils.guest import GuestCartCookieMixin
+from .utils.storage import get_cart_store, get_request_cart_store, CartError, CartBatchError
+from .utils.validation import validate_cart
+from users.authentication import TokenClaimsAuthentication
 
 
-class CartView(APIView):
+def serialize_cart(cart, request):
+    """Serialize a cart, loading its items in a single prefetched pass"""
+    prefetch_related_objects([cart], cart_items_prefetch())
+    return CartSerializer(cart, context={'request': request}).data
+
+
+def wants_delta(request):
+    """Check if the client asked for a delta instead of the full cart"""
+    return 'delta' in (request.query_params.get('response'), request.headers.get('X-Cart-Response'))
+
+
+def serialize_cart_delta(cart, item_id=None, product_id=None, removed_item_id=None):
+    """
+    Serialize only what a mutation changed: the item (looked up by id or
+    product), the new totals and the cart version. Clients refetch the full
+    cart when their version falls behind.
+    """
+    item = None
+    if item_id is not None or product_id is not None:
+        if cart.has_prefetched_items():
+            item = next((
+                cart_item for cart_item in cart.get_items()
+                if cart_item.pk == item_id or cart_item.product_id == product_id
+            ), None)
+        else:
+            lookup = {'id': item_id} if item_id is not None else {'product_id': product_id}
+            item = CartItem.objects.select_related('product').filter(cart=cart, **lookup).first()
+    
+    summary = cart.get_summary()
+    data = {
+        'item': CartItemDeltaSerializer(item).data if item else None,
+        'total': float(summary['total']),
+        'items_count': summary['items_count'],
+        'version': summary['version'],
+    }
+    if removed_item_id is not None:
+        data['removed_item_id'] = removed_item_id
+    return data
+
+
+class CartView(GuestCartCookieMixin, APIView):
     """Get user's cart"""
-    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [permissions.AllowAny]
     
     def get(self, request):
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        serializer = CartSerializer(cart, context={'request': request})
-        return Response(serializer.data)
+        cart = get_request_cart_store(request).get_cart(request)
+        return Response(serialize_cart(cart, request))
 
 
-class AddToCartView(APIView):
+class AddToCartView(GuestCartCookieMixin, APIView):
     """Add item to cart"""
-    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [permissions.AllowAny]
     
     def post(self, request):
         serializer = AddToCartSerializer(data=request.data)
@@ -32,45 +79,30 @@ class AddToCartView(APIView):
         product_id = serializer.validated_data['product_id']
         quantity = serializer.validated_data['quantity']
         
-        # Get or create cart
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        
-        # Get product
-        product = get_object_or_404(Product, id=product_id, is_approved=True, is_active=True)
-        
-        # Check stock
-        if product.stock_quantity < quantity:
+        # Add or update cart item (checks the product and its stock)
+        try:
+            cart = get_request_cart_store(request).add_item(request, product_id, quantity)
+        except CartError as e:
             return Response({
-                'error': f'Only {product.stock_quantity} items available in stock.'
+                'error': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Add or update cart item
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            # Update quantity
-            new_quantity = cart_item.quantity + quantity
-            if product.stock_quantity < new_quantity:
-                return Response({
-                    'error': f'Only {product.stock_quantity} items available in stock.'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            cart_item.quantity = new_quantity
-            cart_item.save()
+        if wants_delta(request):
+            return Response({
+                'message': 'Item added to cart successfully.',
+                **serialize_cart_delta(cart, product_id=product_id)
+            }, status=status.HTTP_200_OK)
         
-        cart_serializer = CartSerializer(cart, context={'request': request})
         return Response({
             'message': 'Item added to cart successfully.',
-            'cart': cart_serializer.data
+            'cart': serialize_cart(cart, request)
         }, status=status.HTTP_200_OK)
 
 
-class UpdateCartItemView(APIView):
+class UpdateCartItemView(GuestCartCookieMixin, APIView):
     """Update cart item quantity"""
-    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [permissions.AllowAny]
     
     def put(self, request, item_id):
         serializer = UpdateCartItemSerializer(data=request.data)
@@ -78,52 +110,119 @@ class UpdateCartItemView(APIView):
         
         quantity = serializer.validated_data['quantity']
         
-        cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
-        
-        # Check stock
-        if cart_item.product.stock_quantity < quantity:
+        try:
+            cart = get_request_cart_store(request).update_item(request, item_id, quantity)
+        except CartError as e:
             return Response({
-                'error': f'Only {cart_item.product.stock_quantity} items available in stock.'
+                'error': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        cart_item.quantity = quantity
-        cart_item.save()
+        if wants_delta(request):
+            return Response({
+                'message': 'Cart item updated successfully.',
+                **serialize_cart_delta(cart, item_id=item_id)
+            }, status=status.HTTP_200_OK)
         
-        cart_serializer = CartSerializer(cart_item.cart, context={'request': request})
         return Response({
             'message': 'Cart item updated successfully.',
-            'cart': cart_serializer.data
+            'cart': serialize_cart(cart, request)
         }, status=status.HTTP_200_OK)
 
 
-class RemoveCartItemView(APIView):
+class RemoveCartItemView(GuestCartCookieMixin, APIView):
     """Remove item from cart"""
-    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [permissions.AllowAny]
     
     def delete(self, request, item_id):
-        cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
-        cart = cart_item.cart
-        cart_item.delete()
+        cart = get_request_cart_store(request).remove_item(request, item_id)
+        
+        if wants_delta(request):
+            return Response({
+                'message': 'Item removed from cart successfully.',
+                **serialize_cart_delta(cart, removed_item_id=item_id)
+            }, status=status.HTTP_200_OK)
         
-        cart_serializer = CartSerializer(cart, context={'request': request})
         return Response({
             'message': 'Item removed from cart successfully.',
-            'cart': cart_serializer.data
+            'cart': serialize_cart(cart, request)
         }, status=status.HTTP_200_OK)
 
 
-class ClearCartView(APIView):
+class CartBatchView(GuestCartCookieMixin, APIView):
+    """Apply several add, update and remove operations in one transaction"""
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [permissions.AllowAny]
+    
+    def post(self, request):
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            cart = get_request_cart_store(request).apply_batch(
+                request, serializer.validated_data['operations']
+            )
+        except CartBatchError as e:
+            return Response({
+                'error': str(e),
+                'errors': e.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except CartError as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'message': 'Cart updated successfully.',
+            'cart': serialize_cart(cart, request)
+        }, status=status.HTTP_200_OK)
+
+
+class ClearCartView(GuestCartCookieMixin, APIView):
     """Clear all items from cart"""
-    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [permissions.AllowAny]
     
     def delete(self, request):
-        try:
-            cart = Cart.objects.get(user=request.user)
-            cart.items.all().delete()
+        if get_request_cart_store(request).clear(request):
             return Response({
                 'message': 'Cart cleared successfully.'
             }, status=status.HTTP_200_OK)
-        except Cart.DoesNotExist:
-            return Response({
-                'message': 'Cart is already empty.'
-            }, status=status.HTTP_200_OK)
+        return Response({
+            'message': 'Cart is already empty.'
+        }, status=status.HTTP_200_OK)
+
+
+class ValidateCartView(APIView):
+    """
+    Check the cart against current stock, availability and prices.
+    GET reports the discrepancies, POST also clamps the cart to match.
+    """
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        return self.validate(request, clamp=False)
+    
+    def post(self, request):
+        return self.validate(request, clamp=True)
+    
+    def validate(self, request, clamp):
+        store = get_cart_store()
+        # Cached changes must be in the database before checking it
+        store.persist(request.user)
+        cart, created = Cart.objects.get_or_create(user=request.user)
+        
+        issues, changed = validate_cart(cart, clamp=clamp)
+        if changed:
+            transaction.on_commit(lambda: store.invalidate(request.user))
+        
+        summary = cart.get_summary()
+        return Response({
+            'valid': not issues,
+            'issues': issues,
+            'clamped': changed,
+            'total': float(summary['total']),
+            'items_count': summary['items_count'],
+            'version': summary['version'],
+        }, status=status.HTTP_200_OK)
@@ -61,6 +61,7 @@ INSTALLED_APPS = [
     'cart.apps.CartConfig',
     'orders.apps.OrdersConfig',
     'reviews.apps.ReviewsConfig',
+    'analytics.apps.AnalyticsConfig',
 ]
 
 MIDDLEWARE = [
@@ -109,6 +110,12 @@ DATABASES = {
 }
 
 
+# Cache
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
@@ -158,7 +165,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -169,6 +176,8 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # Reverse proxies in front of the app, client IPs are read from X-Forwarded-For past them
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=0),
 }
 
 # JWT Settings
@@ -179,6 +188,7 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefreshSerializer',
 }
 
 # Email Settings
@@ -190,6 +200,19 @@ EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default='noreply@ecommerce.com')
 
+# Emails go through an outbox delivered by `manage.py send_queued_emails`.
+# Failed sends are retried with exponential backoff (seconds) up to EMAIL_MAX_ATTEMPTS;
+# after EMAIL_CIRCUIT_BREAKER_THRESHOLD failed batches in a row delivery pauses
+# for EMAIL_CIRCUIT_BREAKER_COOLDOWN seconds.
+EMAIL_MAX_ATTEMPTS = env.int('EMAIL_MAX_ATTEMPTS', default=8)
+EMAIL_RETRY_BASE_DELAY = env.int('EMAIL_RETRY_BASE_DELAY', default=30)
+EMAIL_RETRY_MAX_DELAY = env.int('EMAIL_RETRY_MAX_DELAY', default=60 * 60)
+EMAIL_CIRCUIT_BREAKER_THRESHOLD = env.int('EMAIL_CIRCUIT_BREAKER_THRESHOLD', default=3)
+EMAIL_CIRCUIT_BREAKER_COOLDOWN = env.int('EMAIL_CIRCUIT_BREAKER_COOLDOWN', default=5 * 60)
+# Emails claimed by a worker that hasn't recorded a result after this many seconds
+# (it crashed mid-batch) are picked up again.
+EMAIL_SENDING_TIMEOUT = env.int('EMAIL_SENDING_TIMEOUT', default=10 * 60)
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     env('FRONTEND_URL', default='http://localhost:5173'),
@@ -223,3 +246,75 @@ RESET_PASSWORD_TOKEN_LIFETIME = env.int('JWT_RESET_PASSWORD_TOKEN_LIFETIME', def
 
 # Frontend URL for email links
 FRONTEND_URL = env('FRONTEND_URL', default='http://localhost:5173')
+
+# Cart storage: 'database' writes every change immediately, 'cache' keeps
+# active carts in the cache and flushes them with `manage.py flush_cart_cache`.
+# The cache mode needs a cache shared by all workers (e.g. Redis or Memcached).
+CART_STORAGE = env('CART_STORAGE', default='database')
+CART_CACHE_TIMEOUT = env.int('CART_CACHE_TIMEOUT', default=60 * 60 * 24 * 7)
+
+# Guest carts are kept in a signed cookie and merged into the user's cart on login
+GUEST_CART_COOKIE_NAME = 'guest_cart'
+GUEST_CART_COOKIE_AGE = env.int('GUEST_CART_COOKIE_AGE', default=60 * 60 * 24 * 30)
+GUEST_CART_MAX_ITEMS = 50
+
+# Carts untouched for this many days are removed by `manage.py sweep_stale_carts`.
+# Keep it well above CART_CACHE_TIMEOUT so that no cached cart outlives its row.
+CART_STALE_AFTER_DAYS = env.int('CART_STALE_AFTER_DAYS', default=30)
+
+# Starting checkout holds the cart's stock for this many minutes.
+# Expired holds are ignored, `manage.py release_stock_reservations` deletes them.
+STOCK_RESERVATION_TTL_MINUTES = env.int('STOCK_RESERVATION_TTL_MINUTES', default=15)
+
+# Responses to requests sent with an Idempotency-Key header are kept this long.
+# A key whose request hasn't finished after IDEMPOTENCY_LOCK_TIMEOUT seconds can be reused.
+IDEMPOTENCY_KEY_TTL_HOURS = env.int('IDEMPOTENCY_KEY_TTL_HOURS', default=24)
+IDEMPOTENCY_LOCK_TIMEOUT = env.int('IDEMPOTENCY_LOCK_TIMEOUT', default=60)
+
+# Sales rollups are updated by `manage.py update_sales_rollups`. Orders changed in the
+# last ANALYTICS_ROLLUP_LAG_SECONDS are left for the next run, so in-flight ones aren't missed.
+ANALYTICS_ROLLUP_LAG_SECONDS = env.int('ANALYTICS_ROLLUP_LAG_SECONDS', default=60)
+
+# Delivered, cancelled and returned orders untouched for this many days are moved to the
+# archive tables by `manage.py archive_orders`; order details still find them there.
+ORDER_ARCHIVE_AFTER_DAYS = env.int('ORDER_ARCHIVE_AFTER_DAYS', default=180)
+
+# Order items claimed for fulfillment but not shipped within this many minutes
+# go back to the seller's queue.
+FULFILLMENT_CLAIM_TIMEOUT_MINUTES = env.int('FULFILLMENT_CLAIM_TIMEOUT_MINUTES', default=30)
+
+# Products with this much stock or less are listed as low stock on the seller dashboard
+SELLER_LOW_STOCK_THRESHOLD = env.int('SELLER_LOW_STOCK_THRESHOLD', default=5)
+
+# Payment provider webhooks are signed with this secret (HMAC-SHA256); without it
+# every notification is refused. Signatures older than PAYMENT_WEBHOOK_TOLERANCE
+# seconds are refused too. Events are applied by `manage.py process_payment_events`.
+PAYMENT_WEBHOOK_SECRET = env('PAYMENT_WEBHOOK_SECRET', default='')
+PAYMENT_WEBHOOK_TOLERANCE = env.int('PAYMENT_WEBHOOK_TOLERANCE', default=5 * 60)
+
+# Authenticated users are cached for AUTH_USER_CACHE_SECONDS in the shared cache and
+# AUTH_USER_LOCAL_CACHE_SECONDS in each process, so changes made by another process can
+# take that long to show. The local-memory cache is per process: set CACHE_URL to a
+# shared cache when running several.
+AUTH_USER_CACHE_SECONDS = env.int('AUTH_USER_CACHE_SECONDS', default=5 * 60)
+AUTH_USER_LOCAL_CACHE_SECONDS = env.int('AUTH_USER_LOCAL_CACHE_SECONDS', default=5)
+
+# Revoked tokens (logout, rotated refresh tokens) are checked against a Bloom filter kept by
+# each process. It picks up tokens revoked elsewhere every REVOCATION_FILTER_REFRESH_SECONDS
+# and is rebuilt every REVOCATION_FILTER_REBUILD_SECONDS, after `manage.py prune_revoked_tokens`
+# has deleted the expired ones.
+REVOCATION_FILTER_REFRESH_SECONDS = env.int('REVOCATION_FILTER_REFRESH_SECONDS', default=30)
+REVOCATION_FILTER_REBUILD_SECONDS = env.int('REVOCATION_FILTER_REBUILD_SECONDS', default=60 * 60)
+
+# Login attempts are limited per client IP (read like DRF throttles do, see NUM_PROXIES) and
+# per account, in each process: up to *_BURST at once, refilled at *_PER_MINUTE.
+# Passwords are checked on LOGIN_HASH_WORKERS threads;
+# when LOGIN_HASH_MAX_PENDING checks are waiting, logins wait up to LOGIN_HASH_WAIT_SECONDS
+# for a slot, then get a 503.
+LOGIN_IP_BURST = env.int('LOGIN_IP_BURST', default=20)
+LOGIN_IP_PER_MINUTE = env.int('LOGIN_IP_PER_MINUTE', default=10)
+LOGIN_ACCOUNT_BURST = env.int('LOGIN_ACCOUNT_BURST', default=10)
+LOGIN_ACCOUNT_PER_MINUTE = env.int('LOGIN_ACCOUNT_PER_MINUTE', default=5)
+LOGIN_HASH_WORKERS = env.int('LOGIN_HASH_WORKERS', default=2)
+LOGIN_HASH_MAX_PENDING = env.int('LOGIN_HASH_MAX_PENDING', default=16)
+LOGIN_HASH_WAIT_SECONDS = env.int('LOGIN_HASH_WAIT_SECONDS', default=5)
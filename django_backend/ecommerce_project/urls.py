@@ -50,6 +50,7 @@ urlpatterns = [
     path('api/cart/', include('cart.urls')),
     path('api/orders/', include('orders.urls')),
     path('api/', include('reviews.urls')),
+    path('api/analytics/', include('analytics.urls')),
 ]
 
 # Serve media files in development
@@ -1,13 +1,33 @@
-from django.contrib import admin
-from .models import ShippingAddress, Order, OrderItem
+from django.contrib import admin, messages
+from django.utils import timezone
+from .models import ShippingAddress, Order, OrderItem, ArchivedOrder, ArchivedOrderItem, PaymentEvent
+from .utils.cancellation import close_orders_in_batches
+from .utils.fulfillment import ORDER_TRANSITIONS
+from .utils.identifiers import uuid_search_range
+
+
+class OrderNumberSearchMixin:
+    """
+    Search order numbers by prefix, or by day for time-ordered ones, as a
+    range on their index rather than a text scan. Other terms go to the
+    regular search fields.
+    """
+    order_number_field = 'order_number'
+    
+    def get_search_results(self, request, queryset, search_term):
+        bounds = uuid_search_range(search_term) if search_term else None
+        if bounds:
+            # Only the range, an OR with the text search would scan the table anyway
+            return queryset.filter(**{f'{self.order_number_field}__range': bounds}), False
+        return super().get_search_results(request, queryset, search_term)
 
 
 class OrderItemInline(admin.TabularInline):
     """Inline admin for order items"""
     model = OrderItem
     extra = 0
-    fields = ['product_title', 'product_price', 'quantity']
-    readonly_fields = ['product_title', 'product_price', 'quantity']
+    fields = ['product_title', 'product_price', 'quantity', 'fulfillment_status']
+    readonly_fields = ['product_title', 'product_price', 'quantity', 'fulfillment_status']
 
 
 @admin.register(ShippingAddress)
@@ -20,58 +40,137 @@ class ShippingAddressAdmin(admin.ModelAdmin):
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(OrderNumberSearchMixin, admin.ModelAdmin):
     """Order Admin"""
-    list_display = ['order_number', 'user', 'status', 'total_amount', 'is_paid', 'is_delivered', 'created_at']
+    list_display = ['order_number', 'user', 'status', 'total_amount', 'items_count', 'is_paid', 'is_delivered', 'created_at']
     list_filter = ['status', 'is_paid', 'is_delivered', 'created_at']
-    search_fields = ['order_number', 'user__email']
-    list_editable = ['status']
+    search_fields = ['user__email']
+    list_select_related = ['user']
     ordering = ['-created_at']
     inlines = [OrderItemInline]
     
     fieldsets = (
         ('Order Information', {
-            'fields': ('order_number', 'user', 'status', 'total_amount')
+            'fields': ('order_number', 'user', 'status', 'total_amount', 'items_count')
         }),
         ('Shipping Information', {
             'fields': ('shipping_full_name', 'shipping_phone', 'shipping_address', 'shipping_city', 'shipping_country', 'shipping_postal_code')
         }),
         ('Payment Information', {
-            'fields': ('payment_method', 'is_paid', 'paid_at')
+            'fields': ('payment_method', 'is_paid', 'paid_at', 'is_refunded', 'refunded_at')
         }),
         ('Delivery Information', {
             'fields': ('is_delivered', 'delivered_at')
         }),
     )
     
-    readonly_fields = ['order_number', 'created_at', 'updated_at']
+    # Statuses change through the actions, which keep items, stock and sales counters in step
+    readonly_fields = ['order_number', 'status', 'items_count', 'created_at', 'updated_at']
+    
+    actions = ['mark_as_processing', 'mark_as_shipped', 'mark_as_delivered', 'cancel_orders', 'return_orders']
     
-    actions = ['mark_as_processing', 'mark_as_shipped', 'mark_as_delivered']
+    def _movable(self, request, queryset, status):
+        """Ids of the selected orders that can move to ``status``, telling about the others"""
+        order_ids = list(queryset.filter(status__in=ORDER_TRANSITIONS[status]).values_list('pk', flat=True))
+        skipped = queryset.count() - len(order_ids)
+        if skipped:
+            self.message_user(request, f'{skipped} orders can\'t be marked as {status} from their status and were skipped.', messages.WARNING)
+        return order_ids
     
     def mark_as_processing(self, request, queryset):
         """Mark orders as processing"""
-        updated = queryset.update(status='processing')
+        order_ids = self._movable(request, queryset, 'processing')
+        updated = Order.objects.filter(pk__in=order_ids).update(status='processing', updated_at=timezone.now())
         self.message_user(request, f'{updated} orders marked as processing.')
     mark_as_processing.short_description = 'Mark as Processing'
     
     def mark_as_shipped(self, request, queryset):
         """Mark orders as shipped"""
-        updated = queryset.update(status='shipped')
+        order_ids = self._movable(request, queryset, 'shipped')
+        OrderItem.objects.filter(order_id__in=order_ids).exclude(
+            fulfillment_status='delivered'
+        ).update(fulfillment_status='shipped')
+        updated = Order.objects.filter(pk__in=order_ids).update(status='shipped', updated_at=timezone.now())
         self.message_user(request, f'{updated} orders marked as shipped.')
     mark_as_shipped.short_description = 'Mark as Shipped'
     
     def mark_as_delivered(self, request, queryset):
         """Mark orders as delivered"""
-        from django.utils import timezone
-        updated = queryset.update(status='delivered', is_delivered=True, delivered_at=timezone.now())
+        now = timezone.now()
+        order_ids = self._movable(request, queryset, 'delivered')
+        OrderItem.objects.filter(order_id__in=order_ids).update(fulfillment_status='delivered')
+        updated = Order.objects.filter(pk__in=order_ids).update(
+            status='delivered', is_delivered=True, delivered_at=now, updated_at=now
+        )
         self.message_user(request, f'{updated} orders marked as delivered.')
     mark_as_delivered.short_description = 'Mark as Delivered'
+    
+    def cancel_orders(self, request, queryset):
+        """Cancel orders that haven't shipped and restock their items, a batch of orders per transaction"""
+        cancelled = close_orders_in_batches(queryset.values_list('pk', flat=True), 'cancelled')
+        skipped = queryset.count() - cancelled
+        if skipped:
+            self.message_user(request, f'{skipped} orders have shipped or are closed and were skipped; return shipped orders once they come back.', messages.WARNING)
+        self.message_user(request, f'{cancelled} orders cancelled and restocked.')
+    cancel_orders.short_description = 'Cancel and Restock'
+    
+    def return_orders(self, request, queryset):
+        """Return shipped or delivered orders whose goods came back and restock their items"""
+        returned = close_orders_in_batches(queryset.values_list('pk', flat=True), 'returned')
+        skipped = queryset.count() - returned
+        if skipped:
+            self.message_user(request, f'{skipped} orders haven\'t shipped or are closed and were skipped.', messages.WARNING)
+        self.message_user(request, f'{returned} orders returned and restocked.')
+    return_orders.short_description = 'Return and Restock'
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(OrderNumberSearchMixin, admin.ModelAdmin):
     """Order Item Admin"""
-    list_display = ['order', 'product_title', 'product_price', 'quantity', 'created_at']
-    list_filter = ['created_at']
-    search_fields = ['order__order_number', 'product_title']
+    list_display = ['order', 'product_title', 'product_price', 'quantity', 'seller', 'fulfillment_status', 'created_at']
+    list_filter = ['fulfillment_status', 'created_at']
+    search_fields = ['product_title']
+    order_number_field = 'order__order_number'
+    list_select_related = ['order__user', 'seller']
+    ordering = ['-created_at']
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    """Inline admin for archived order items"""
+    model = ArchivedOrderItem
+    extra = 0
+    fields = ['product_title', 'product_price', 'quantity']
+    readonly_fields = ['product_title', 'product_price', 'quantity']
+    can_delete = False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(OrderNumberSearchMixin, admin.ModelAdmin):
+    """Archived Order Admin (read only, filled by archive_orders)"""
+    list_display = ['order_number', 'user', 'status', 'total_amount', 'items_count', 'created_at', 'archived_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['user__email']
+    list_select_related = ['user']
     ordering = ['-created_at']
+    inlines = [ArchivedOrderItemInline]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(OrderNumberSearchMixin, admin.ModelAdmin):
+    """Payment Event Admin (append-only, written by the payment webhook)"""
+    list_display = ['event_id', 'event_type', 'order_number', 'status', 'result', 'received_at', 'processed_at']
+    list_filter = ['status', 'event_type', 'received_at']
+    search_fields = ['event_id']
+    ordering = ['-received_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,26 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from orders.utils.archive import archive_batch
+
+
+class Command(BaseCommand):
+    help = 'Move finished (delivered, cancelled, returned) orders to the archive tables in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+                            help='Archive finished orders not updated for this many days')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of orders archived per transaction')
+    
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['older_than_days'])
+        archived = 0
+        while True:
+            count = archive_batch(before, batch_size=options['batch_size'])
+            if not count:
+                break
+            archived += count
+        
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} orders.'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from orders.models import Order
+from orders.utils.fake_provider import FakePaymentProvider
+
+
+class Command(BaseCommand):
+    help = 'Send a signed fake payment event for an order to the payment webhook (development only)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('order_id', type=int)
+        parser.add_argument('--amount', help='Amount paid, the order total by default')
+        parser.add_argument('--repeat', type=int, default=1,
+                            help='Deliver the same event this many times, like provider retries')
+    
+    def handle(self, *args, **options):
+        try:
+            order = Order.objects.get(pk=options['order_id'])
+        except Order.DoesNotExist:
+            raise CommandError(f"Order {options['order_id']} does not exist.")
+        
+        provider = FakePaymentProvider()
+        event = provider.payment_succeeded(order, amount=options['amount'])
+        for _ in range(options['repeat']):
+            response = provider.deliver(event)
+            if response.status_code != 200:
+                raise CommandError(f'Webhook answered {response.status_code}: {response.content.decode()}')
+        
+        self.stdout.write(self.style.SUCCESS(f"Delivered event {event['id']} {options['repeat']} times."))
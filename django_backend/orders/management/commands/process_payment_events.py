@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from orders.utils.payments import apply_pending_events
+
+
+class Command(BaseCommand):
+    help = 'Apply received payment events to their orders in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Number of events applied per transaction')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running, polling for events every INTERVAL seconds')
+    
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            while True:
+                processed = apply_pending_events(batch_size=options['batch_size'])
+                if not processed:
+                    break
+                total += processed
+            
+            if total:
+                self.stdout.write(self.style.SUCCESS(f'Processed {total} payment events.'))
+            
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
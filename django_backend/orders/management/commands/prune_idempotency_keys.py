@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from orders.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete expired idempotency keys in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of keys deleted per statement')
+    
+    def handle(self, *args, **options):
+        now = timezone.now()
+        pruned = 0
+        while True:
+            key_ids = list(
+                IdempotencyKey.objects.filter(expires_at__lte=now)
+                .order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not key_ids:
+                break
+            deleted, _ = IdempotencyKey.objects.filter(pk__in=key_ids).delete()
+            pruned += deleted
+        
+        self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} expired idempotency keys.'))
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:42
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_items_count(apps, schema_editor):
+    """Store the item quantity of existing orders in one UPDATE"""
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    quantities = OrderItem.objects.filter(
+        order=OuterRef('pk')
+    ).values('order').annotate(total=Sum('quantity')).values('total')
+    Order.objects.update(items_count=Coalesce(Subquery(quantities), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_idempotencykey'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_items_count, migrations.RunPython.noop),
+    ]
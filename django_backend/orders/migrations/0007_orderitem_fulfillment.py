@@ -0,0 +1,64 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_fulfillment(apps, schema_editor):
+    """Snapshot the seller of existing items and carry over shipped/delivered order states"""
+    Product = apps.get_model('products', 'Product')
+    for model_name in ['OrderItem', 'ArchivedOrderItem']:
+        Item = apps.get_model('orders', model_name)
+        sellers = Product.objects.filter(pk=OuterRef('product_id')).values('seller_id')
+        Item.objects.update(seller_id=Subquery(sellers))
+        for status in ['shipped', 'delivered']:
+            Item.objects.filter(order__status=status).update(fulfillment_status=status)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_archivedorder'),
+        ('products', '0004_stockshard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='fulfillment_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='seller',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_items', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='fulfillment_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='seller',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sold_items', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['seller', 'fulfillment_status', 'created_at'], name='orders_orde_seller__24bef7_idx'),
+        ),
+        migrations.RunPython(backfill_fulfillment, migrations.RunPython.noop),
+    ]
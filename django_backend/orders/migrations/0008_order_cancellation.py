@@ -0,0 +1,61 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:53
+
+from django.db import migrations, models
+
+
+def backfill_cancelled_items(apps, schema_editor):
+    """Take the items of orders cancelled before this out of the fulfillment queue"""
+    for model_name in ['OrderItem', 'ArchivedOrderItem']:
+        Item = apps.get_model('orders', model_name)
+        Item.objects.filter(order__status='cancelled').update(fulfillment_status='cancelled')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_orderitem_fulfillment'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='is_refunded',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='refunded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='is_refunded',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='refunded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='archivedorder',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('returned', 'Returned')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='archivedorderitem',
+            name='fulfillment_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('returned', 'Returned')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('returned', 'Returned')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='fulfillment_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('returned', 'Returned')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(backfill_cancelled_items, migrations.RunPython.noop),
+    ]
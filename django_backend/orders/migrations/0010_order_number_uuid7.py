@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:56
+
+import orders.utils.identifiers
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_paymentevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.UUIDField(default=orders.utils.identifiers.uuid7, editable=False, unique=True),
+        ),
+    ]
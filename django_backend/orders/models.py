@@ -1,8 +1,9 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils.translation import gettext_lazy as _
 from products.models import Product
-import uuid
+from .utils.identifiers import uuid7
 
 
 class ShippingAddress(models.Model):
@@ -44,6 +45,7 @@ class Order(models.Model):
         ('shipped', 'Shipped'),
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled'),
+        ('returned', 'Returned'),
     )
     
     PAYMENT_METHOD_CHOICES = (
@@ -53,9 +55,10 @@ class Order(models.Model):
     )
     
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
-    order_number = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    order_number = models.UUIDField(default=uuid7, editable=False, unique=True)  # Time-ordered, new orders append to the index
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    items_count = models.PositiveIntegerField(default=0)  # Total quantity, stored at checkout
     
     # Shipping information (snapshot at order time)
     shipping_full_name = models.CharField(max_length=255)
@@ -69,6 +72,8 @@ class Order(models.Model):
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES, default='cash')
     is_paid = models.BooleanField(default=False)
     paid_at = models.DateTimeField(null=True, blank=True)
+    is_refunded = models.BooleanField(default=False)  # Paid, then cancelled or returned
+    refunded_at = models.DateTimeField(null=True, blank=True)
     
     # Delivery tracking
     is_delivered = models.BooleanField(default=False)
@@ -84,6 +89,7 @@ class Order(models.Model):
         indexes = [
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['status']),
+            models.Index(fields=['updated_at']),  # Changed orders, read by the sales rollups
         ]
     
     def __str__(self):
@@ -91,26 +97,57 @@ class Order(models.Model):
     
     def get_total_items(self):
         """Get total number of items in order"""
-        return sum(item.quantity for item in self.items.all())
+        return self.items_count
 
 
 class OrderItem(models.Model):
     """Order Item Model"""
+    FULFILLMENT_STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('shipped', 'Shipped'),
+        ('delivered', 'Delivered'),
+        ('cancelled', 'Cancelled'),
+        ('returned', 'Returned'),
+    )
+    
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
     
     # Snapshot of product details at order time
     product_title = models.CharField(max_length=255)
     product_price = models.DecimalField(max_digits=10, decimal_places=2)
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sold_items'
+    )
     
     quantity = models.IntegerField()
     
+    # Fulfillment by the seller
+    fulfillment_status = models.CharField(max_length=20, choices=FULFILLMENT_STATUS_CHOICES, default='pending')
+    claimed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='claimed_items'
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         verbose_name = _('order item')
         verbose_name_plural = _('order items')
         ordering = ['created_at']
+        indexes = [
+            # A seller's fulfillment queue, oldest first
+            models.Index(fields=['seller', 'fulfillment_status', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.quantity} x {self.product_title}"
@@ -118,3 +155,141 @@ class OrderItem(models.Model):
     def get_subtotal(self):
         """Calculate subtotal for this item"""
         return self.product_price * self.quantity
+
+
+class IdempotencyKey(models.Model):
+    """Stored response of a request sent with an Idempotency-Key header"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    scope = models.CharField(max_length=50)  # Endpoint the key was used on
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # None while the request runs
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = _('idempotency key')
+        verbose_name_plural = _('idempotency keys')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+        constraints = [
+            # Inserting the row claims the key, so concurrent duplicates can't both run
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='unique_idempotency_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope} {self.key} by user {self.user_id}"
+
+
+class ArchivedOrder(models.Model):
+    """Finished order moved out of the hot orders table by archive_orders"""
+    id = models.BigIntegerField(primary_key=True)  # Same id as the original order
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_orders')
+    order_number = models.UUIDField(unique=True, editable=False)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    items_count = models.PositiveIntegerField(default=0)
+    
+    shipping_full_name = models.CharField(max_length=255)
+    shipping_phone = models.CharField(max_length=20)
+    shipping_address = models.TextField()
+    shipping_city = models.CharField(max_length=100)
+    shipping_country = models.CharField(max_length=100)
+    shipping_postal_code = models.CharField(max_length=20)
+    
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_METHOD_CHOICES)
+    is_paid = models.BooleanField(default=False)
+    paid_at = models.DateTimeField(null=True, blank=True)
+    is_refunded = models.BooleanField(default=False)
+    refunded_at = models.DateTimeField(null=True, blank=True)
+    
+    is_delivered = models.BooleanField(default=False)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('archived order')
+        verbose_name_plural = _('archived orders')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Archived order {self.order_number} by {self.user.email}"
+    
+    def get_total_items(self):
+        """Get total number of items in order"""
+        return self.items_count
+
+
+class ArchivedOrderItem(models.Model):
+    """Item of an archived order"""
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='+')
+    
+    product_title = models.CharField(max_length=255)
+    product_price = models.DecimalField(max_digits=10, decimal_places=2)
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    
+    quantity = models.IntegerField()
+    fulfillment_status = models.CharField(max_length=20, choices=OrderItem.FULFILLMENT_STATUS_CHOICES, default='pending')
+    
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = _('archived order item')
+        verbose_name_plural = _('archived order items')
+        ordering = ['created_at']
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.product_title}"
+    
+    def get_subtotal(self):
+        """Calculate subtotal for this item"""
+        return self.product_price * self.quantity
+
+
+class PaymentEvent(models.Model):
+    """
+    Raw notification received from the payment provider. Rows are only ever
+    inserted by the webhook, one per provider event id, and applied to their
+    orders by `manage.py process_payment_events`.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('applied', 'Applied'),
+        ('ignored', 'Ignored'),
+        ('rejected', 'Rejected'),
+    )
+    
+    event_id = models.CharField(max_length=255, unique=True)  # Provider's id, retries reuse it
+    event_type = models.CharField(max_length=100)
+    order_number = models.UUIDField(null=True, blank=True)
+    payload = models.JSONField()
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    result = models.CharField(max_length=255, blank=True)  # Why the event was ignored or rejected
+    
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('payment event')
+        verbose_name_plural = _('payment events')
+        ordering = ['-received_at']
+        indexes = [
+            # The worker polls pending events, oldest first
+            models.Index(fields=['status', 'received_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.status})"
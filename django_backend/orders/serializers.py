@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import ShippingAddress, Order, OrderItem
+from .models import ShippingAddress, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
 from products.models import Product
 
 
@@ -33,14 +33,70 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ['id', 'order_number', 'status', 'total_amount', 'total_items',
                   'shipping_full_name', 'shipping_phone', 'shipping_address',
                   'shipping_city', 'shipping_country', 'shipping_postal_code',
-                  'payment_method', 'is_paid', 'paid_at', 'is_delivered',
-                  'delivered_at', 'items', 'created_at', 'updated_at']
+                  'payment_method', 'is_paid', 'paid_at', 'is_refunded', 'refunded_at',
+                  'is_delivered', 'delivered_at', 'items', 'created_at', 'updated_at']
         read_only_fields = ['id', 'order_number', 'items', 'created_at', 'updated_at']
     
     def get_total_items(self, obj):
         return obj.get_total_items()
 
 
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Order Summary Serializer (for list views, without items)"""
+    total_items = serializers.IntegerField(source='items_count', read_only=True)
+    
+    class Meta:
+        model = Order
+        fields = ['id', 'order_number', 'status', 'total_amount', 'total_items',
+                  'payment_method', 'is_paid', 'is_delivered', 'created_at']
+        read_only_fields = fields
+
+
+class ArchivedOrderItemSerializer(OrderItemSerializer):
+    """Archived Order Item Serializer"""
+    class Meta(OrderItemSerializer.Meta):
+        model = ArchivedOrderItem
+
+
+class ArchivedOrderSerializer(OrderSerializer):
+    """Archived Order Serializer (same shape as OrderSerializer)"""
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+    
+    class Meta(OrderSerializer.Meta):
+        model = ArchivedOrder
+
+
+class ArchivedOrderSummarySerializer(OrderSummarySerializer):
+    """Archived Order Summary Serializer"""
+    class Meta(OrderSummarySerializer.Meta):
+        model = ArchivedOrder
+
+
+class FulfillmentItemSerializer(serializers.ModelSerializer):
+    """Fulfillment Item Serializer (order item with what's needed to ship it)"""
+    order_number = serializers.UUIDField(source='order.order_number', read_only=True)
+    shipping_full_name = serializers.CharField(source='order.shipping_full_name', read_only=True)
+    shipping_phone = serializers.CharField(source='order.shipping_phone', read_only=True)
+    shipping_address = serializers.CharField(source='order.shipping_address', read_only=True)
+    shipping_city = serializers.CharField(source='order.shipping_city', read_only=True)
+    shipping_country = serializers.CharField(source='order.shipping_country', read_only=True)
+    shipping_postal_code = serializers.CharField(source='order.shipping_postal_code', read_only=True)
+    
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'order', 'order_number', 'product', 'product_title', 'quantity',
+                  'fulfillment_status', 'claimed_by', 'claimed_at',
+                  'shipping_full_name', 'shipping_phone', 'shipping_address',
+                  'shipping_city', 'shipping_country', 'shipping_postal_code', 'created_at']
+        read_only_fields = fields
+
+
+class FulfillmentUpdateSerializer(serializers.Serializer):
+    """Fulfillment Update Serializer"""
+    item_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=500)
+    status = serializers.ChoiceField(choices=['shipped', 'delivered'])
+
+
 class OrderCreateSerializer(serializers.Serializer):
     """Order Create Serializer"""
     shipping_address_id = serializers.IntegerField(required=False)
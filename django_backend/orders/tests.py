@@ -1,3 +1,133 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from cart.models import Cart, CartItem
+from products.models import Brand, Category, Product
+from users.models import User
+from .models import Order
+from .utils.checkout import CheckoutError, place_order
+
+SHIPPING = {
+    'shipping_full_name': 'Test Customer',
+    'shipping_phone': '0100000000',
+    'shipping_address': '1 Test Street',
+    'shipping_city': 'Cairo',
+    'shipping_country': 'Egypt',
+    'shipping_postal_code': '11511',
+}
+
+
+def create_user(email, role='customer'):
+    return User.objects.create_user(
+        email=email, username=email, password='testpass123!', role=role, is_active=True
+    )
+
+
+class CheckoutTestCase(TestCase):
+    """Customers with carts of a seller's products"""
+    
+    def setUp(self):
+        cache.clear()
+        self.seller = create_user('seller@example.com', role='seller')
+        self.customer = create_user('customer@example.com')
+        category = Category.objects.create(name='Books')
+        brand = Brand.objects.create(name='Press')
+        self.products = [
+            Product.objects.create(
+                title=f'Book {i}', description='A book', price='10.00', stock_quantity=5,
+                category=category, brand=brand, seller=self.seller
+            )
+            for i in range(2)
+        ]
+    
+    def add_to_cart(self, user, product, quantity):
+        cart, created = Cart.objects.get_or_create(user=user)
+        return CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+    
+    def stock(self, product):
+        return Product.objects.get(pk=product.pk).stock_quantity
+
+
+class PlaceOrderTests(CheckoutTestCase):
+    """place_order is all or nothing and never sells stock it doesn't have"""
+    
+    def test_short_line_rolls_back_the_whole_order(self):
+        available, short = self.products
+        self.add_to_cart(self.customer, available, 2)
+        self.add_to_cart(self.customer, short, 3)
+        Product.objects.filter(pk=short.pk).update(stock_quantity=1)
+        
+        with self.assertRaises(CheckoutError):
+            place_order(self.customer, 'cash', SHIPPING)
+        
+        self.assertEqual(self.stock(available), 5)
+        self.assertEqual(self.stock(short), 1)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart__user=self.customer).count(), 2)
+    
+    def test_decrement_does_not_oversell(self):
+        product = self.products[0]
+        other = create_user('other@example.com')
+        self.add_to_cart(self.customer, product, 3)
+        self.add_to_cart(other, product, 3)
+        
+        place_order(self.customer, 'cash', SHIPPING)
+        with self.assertRaises(CheckoutError):
+            place_order(other, 'cash', SHIPPING)
+        
+        self.assertEqual(self.stock(product), 2)
+        self.assertEqual(Order.objects.count(), 1)
+    
+    def test_stock_sold_after_adding_to_cart_is_not_oversold(self):
+        product = self.products[0]
+        self.add_to_cart(self.customer, product, 3)
+        Product.objects.filter(pk=product.pk).update(stock_quantity=2)
+        
+        with self.assertRaises(CheckoutError):
+            place_order(self.customer, 'cash', SHIPPING)
+        
+        self.assertEqual(self.stock(product), 2)
+
+
+class OrderCreateIdempotencyTests(CheckoutTestCase):
+    """Retrying an order creation with the same Idempotency-Key"""
+    
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.payload = {
+            'payment_method': 'cash',
+            'shipping_full_name': 'Test Customer',
+            'shipping_phone': '0100000000',
+            'shipping_address_line1': '1 Test Street',
+            'shipping_city': 'Cairo',
+            'shipping_country': 'Egypt',
+            'shipping_postal_code': '11511',
+        }
+    
+    def create_order(self, key):
+        return self.client.post('/api/orders/create/', self.payload, HTTP_IDEMPOTENCY_KEY=key)
+    
+    def test_replay_returns_the_original_order(self):
+        product = self.products[0]
+        self.add_to_cart(self.customer, product, 2)
+        
+        first = self.create_order('order-1')
+        replay = self.create_order('order-1')
+        
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.data['order']['id'], first.data['order']['id'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.stock(product), 3)
+    
+    def test_new_key_runs_again(self):
+        self.add_to_cart(self.customer, self.products[0], 2)
+        
+        self.assertEqual(self.create_order('order-1').status_code, 201)
+        # The cart was checked out, so a fresh request has nothing to order
+        self.assertEqual(self.create_order('order-2').status_code, 400)
+        self.assertEqual(Order.objects.count(), 1)
@@ -2,10 +2,17 @@ from django.urls import path
 from .views import (
     ShippingAddressListCreateView,
     ShippingAddressDetailView,
+    CheckoutStartView,
     OrderCreateView,
     OrderListView,
     OrderDetailView,
     OrderMarkAsPaidView,
+    OrderCancelView,
+    OrderReturnView,
+    PaymentWebhookView,
+    FulfillmentQueueView,
+    FulfillmentClaimView,
+    FulfillmentUpdateView,
 )
 
 app_name = 'orders'
@@ -17,7 +24,16 @@ urlpatterns = [
     
     # Orders
     path('', OrderListView.as_view(), name='order_list'),
+    path('checkout/start/', CheckoutStartView.as_view(), name='checkout_start'),
     path('create/', OrderCreateView.as_view(), name='order_create'),
     path('<int:pk>/', OrderDetailView.as_view(), name='order_detail'),
     path('<int:pk>/pay/', OrderMarkAsPaidView.as_view(), name='order_pay'),
+    path('<int:pk>/cancel/', OrderCancelView.as_view(), name='order_cancel'),
+    path('<int:pk>/return/', OrderReturnView.as_view(), name='order_return'),
+    path('payments/webhook/', PaymentWebhookView.as_view(), name='payment_webhook'),
+    
+    # Seller fulfillment
+    path('fulfillment/', FulfillmentQueueView.as_view(), name='fulfillment_queue'),
+    path('fulfillment/claim/', FulfillmentClaimView.as_view(), name='fulfillment_claim'),
+    path('fulfillment/update/', FulfillmentUpdateView.as_view(), name='fulfillment_update'),
 ]
@@ -0,0 +1,53 @@
+"""
+Order archival.
+
+Delivered, cancelled and returned orders that haven't changed for a while
+are copied, with their items, into the ``ArchivedOrder`` tables and deleted
+from the hot ones in the same transaction, one bounded batch at a time. Ids
+are kept, so links to an archived order keep working through the archive
+fallback of the order views.
+"""
+from django.db import transaction
+
+from ..models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+# Orders in these states can't change anymore
+ARCHIVABLE_STATUSES = ['delivered', 'cancelled', 'returned']
+
+
+def _copied_fields(archive_model):
+    """Columns copied from the live table, everything but the archive's own bookkeeping"""
+    return [
+        field.attname for field in archive_model._meta.concrete_fields
+        if field.attname != 'archived_at'
+    ]
+
+
+def archive_batch(before, batch_size=500):
+    """
+    Archive up to ``batch_size`` finished orders last updated before
+    ``before``. Returns the number of orders archived.
+    """
+    with transaction.atomic():
+        # Skip orders another transaction is working on, they'll be picked next time
+        order_ids = list(
+            Order.objects.select_for_update(skip_locked=True).filter(
+                status__in=ARCHIVABLE_STATUSES,
+                updated_at__lt=before
+            ).order_by('updated_at').values_list('pk', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+        
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(**values)
+            for values in Order.objects.filter(pk__in=order_ids).values(*_copied_fields(ArchivedOrder))
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(**values)
+            for values in OrderItem.objects.filter(order_id__in=order_ids).values(*_copied_fields(ArchivedOrderItem))
+        ])
+        OrderItem.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(pk__in=order_ids).delete()
+    
+    return len(order_ids)
@@ -0,0 +1,93 @@
+"""
+Cancellations and returns.
+
+Cancelling or returning orders is set-based: for a whole batch of orders the
+status and refund flag are changed with one UPDATE, the stock of every line
+is put back with one UPDATE over the products and the sales counters are
+decremented, all in one transaction. Restocked units go to the product's
+stock pool, which sharded products draw on as well.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, IntegerField, Value, When
+from django.utils import timezone
+
+from analytics.utils.sellers import record_sales
+from products.models import Product
+from ..models import Order, OrderItem
+
+# New status -> order statuses it can be reached from. Shipped goods have left
+# the warehouse, so they are only restocked by a return once they come back.
+TRANSITIONS = {
+    'cancelled': ['pending', 'processing'],
+    'returned': ['shipped', 'delivered'],
+}
+
+# Statuses customers can cancel their own orders from, before they ship
+CUSTOMER_CANCELLABLE_STATUSES = ['pending', 'processing']
+
+# Statuses customers can return their own orders from, once they have them
+CUSTOMER_RETURNABLE_STATUSES = ['delivered']
+
+
+def close_orders(order_ids, new_status, from_statuses=None):
+    """
+    Cancel or return the given orders in one transaction, restocking their
+    items and flagging paid ones as refunded. Orders not in one of
+    ``from_statuses`` (by default every status leading to ``new_status``) are
+    skipped. Returns the ids of the orders changed.
+    """
+    if from_statuses is None:
+        from_statuses = TRANSITIONS[new_status]
+    now = timezone.now()
+    
+    with transaction.atomic():
+        # Lock the orders so a concurrent cancel can't restock them twice
+        order_ids = list(
+            Order.objects.select_for_update().filter(
+                pk__in=order_ids,
+                status__in=from_statuses
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+        if not order_ids:
+            return []
+        
+        items = list(
+            OrderItem.objects.filter(order_id__in=order_ids).only(
+                'order_id', 'product_id', 'seller_id', 'product_price', 'quantity'
+            )
+        )
+        
+        restock = Counter()
+        for item in items:
+            if item.product_id is not None:
+                restock[item.product_id] += item.quantity
+        if restock:
+            Product.objects.filter(pk__in=restock).update(
+                stock_quantity=F('stock_quantity') + Case(
+                    *[When(pk=pk, then=Value(quantity)) for pk, quantity in restock.items()],
+                    default=Value(0),
+                    output_field=IntegerField()
+                )
+            )
+        
+        Order.objects.filter(pk__in=order_ids).update(
+            status=new_status,
+            is_refunded=F('is_paid'),
+            refunded_at=Case(When(is_paid=True, then=Value(now)), default=None, output_field=DateTimeField()),
+            updated_at=now
+        )
+        OrderItem.objects.filter(order_id__in=order_ids).update(fulfillment_status=new_status)
+        record_sales(items, sign=-1)
+    
+    return order_ids
+
+
+def close_orders_in_batches(order_ids, new_status, batch_size=1000):
+    """Run ``close_orders`` over many orders, one transaction per batch. Returns the number changed."""
+    order_ids = list(order_ids)
+    closed = 0
+    for i in range(0, len(order_ids), batch_size):
+        closed += len(close_orders(order_ids[i:i + batch_size], new_status))
+    return closed
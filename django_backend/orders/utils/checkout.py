@@ -0,0 +1,212 @@
+"""
+Checkout.
+
+Turns the user's cart into an order with set-based statements: the cart
+lines and their products are read in one query, stock is decremented for
+every line with one conditional UPDATE, and the order items are inserted
+with one bulk INSERT. If any product is short the whole transaction is
+rolled back, so there is never an order with partial items.
+
+Starting checkout places time-limited ``StockReservation`` holds on the
+cart lines while the product rows are locked. Lines covered by a hold are
+then sold without looking at other users' holds, so contention on hot
+products is spread over the checkout funnel instead of the final click.
+
+Products with sharded stock (flash sales) take no holds and are sold first
+come, first served by decrementing one of their shards.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from analytics.utils.sellers import record_sales
+from cart.models import CartItem
+from cart.utils.storage import get_cart_store
+from products.models import Product, StockReservation
+from products.utils.stock import take_sharded_stock
+from users.utils.email import send_order_confirmation_email
+from ..models import Order, OrderItem
+
+
+class CheckoutError(Exception):
+    """The cart can't be turned into an order"""
+
+
+class _StockConflict(Exception):
+    """Raised inside the transaction to roll it back when a line is short"""
+
+
+def _stock_shortage_error(user, lines):
+    """Describe the first line the stock left after other users' holds can't cover"""
+    products = Product.objects.with_available_stock(exclude_user=user).in_bulk(
+        [line.product_id for line in lines]
+    )
+    for line in lines:
+        product = products.get(line.product_id)
+        if product is None or not (product.is_approved and product.is_active):
+            return CheckoutError(f'{line.product.title} is no longer available.')
+        if product.available_stock < line.quantity:
+            available = max(product.available_stock, 0)
+            return CheckoutError(
+                f'Insufficient stock for {product.title}. Only {available} available.'
+            )
+    # Stock was restored between the failed update and this check
+    return CheckoutError('Stock changed during checkout, please try again.')
+
+
+def _cart_lines(user):
+    """Persist cached cart changes and return the user's cart lines with their products"""
+    get_cart_store().persist(user)
+    lines = list(
+        CartItem.objects.filter(cart__user=user).select_related('cart', 'product')
+    )
+    if not lines:
+        raise CheckoutError('Cart is empty.')
+    return lines
+
+
+def reserve_cart(user):
+    """
+    Hold stock for every line of the user's cart for
+    STOCK_RESERVATION_TTL_MINUTES, replacing the user's previous holds.
+    Raises CheckoutError if a product can't cover its line.
+    """
+    lines = [line for line in _cart_lines(user) if not line.product.stock_shard_count]
+    expires_at = timezone.now() + timedelta(minutes=settings.STOCK_RESERVATION_TTL_MINUTES)
+    
+    try:
+        with transaction.atomic():
+            StockReservation.objects.filter(user=user).delete()
+            # Lock the products in a stable order so concurrent checkouts can't deadlock
+            available = dict(
+                Product.objects.select_for_update().filter(
+                    id__in=[line.product_id for line in lines],
+                    is_approved=True,
+                    is_active=True
+                ).order_by('pk').with_available_stock().values_list('id', 'available_stock')
+            )
+            for line in lines:
+                if available.get(line.product_id, 0) < line.quantity:
+                    raise _StockConflict
+            
+            reservations = StockReservation.objects.bulk_create([
+                StockReservation(
+                    product_id=line.product_id,
+                    user=user,
+                    quantity=line.quantity,
+                    expires_at=expires_at
+                )
+                for line in lines
+            ])
+    except _StockConflict:
+        raise _stock_shortage_error(user, lines) from None
+    
+    return reservations
+
+
+def release_reservations(user):
+    """Drop the user's checkout holds, returning how many there were"""
+    deleted, _ = StockReservation.objects.filter(user=user).delete()
+    return deleted
+
+
+def place_order(user, payment_method, shipping_data):
+    """
+    Create an order from the user's cart, decrement stock and clear the
+    checked out lines. Raises CheckoutError if the cart is empty or a
+    product is unavailable or short on stock.
+    """
+    cart_store = get_cart_store()
+    lines = _cart_lines(user)
+    plain = [line for line in lines if not line.product.stock_shard_count]
+    sharded = [line for line in lines if line.product.stock_shard_count]
+    
+    quantity_for = [When(pk=line.product_id, then=Value(line.quantity)) for line in plain]
+    quantity = Case(*quantity_for, output_field=IntegerField())
+    
+    # Lines covered by an active hold only need the stock itself; the others
+    # must also leave enough for the holds of other users
+    holds = dict(
+        StockReservation.objects.filter(
+            user=user, expires_at__gt=timezone.now()
+        ).values_list('product_id', 'quantity')
+    )
+    uncovered = [
+        line.product_id for line in plain
+        if holds.get(line.product_id, 0) < line.quantity
+    ]
+    required = quantity
+    if uncovered:
+        held_by_others = StockReservation.objects.filter(
+            product=OuterRef('pk'),
+            expires_at__gt=timezone.now()
+        ).exclude(user=user).values('product').annotate(total=Sum('quantity')).values('total')
+        required = quantity + Case(
+            When(pk__in=uncovered, then=Coalesce(Subquery(held_by_others), 0)),
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    
+    try:
+        with transaction.atomic():
+            # Clear the checked out lines first, keeping anything added meanwhile. A
+            # concurrent checkout of the same lines waits on their row locks, then
+            # finds them gone and rolls back before touching any stock.
+            deleted, _ = CartItem.objects.filter(id__in=[line.pk for line in lines]).delete()
+            if deleted != len(lines):
+                raise CheckoutError('Your cart changed during checkout, please try again.')
+            
+            # Conditional decrement of every line at once, rows without enough stock don't match
+            if plain:
+                updated = Product.objects.filter(
+                    id__in=[line.product_id for line in plain],
+                    is_approved=True,
+                    is_active=True,
+                    stock_quantity__gte=required
+                ).update(stock_quantity=F('stock_quantity') - quantity)
+                if updated != len(plain):
+                    raise _StockConflict
+            for line in sharded:
+                if not (line.product.is_approved and line.product.is_active):
+                    raise _StockConflict
+                if not take_sharded_stock(line.product_id, line.quantity, line.product.stock_shard_count):
+                    raise _StockConflict
+            
+            prices = {
+                line.product_id: line.product.get_discounted_price()
+                for line in lines
+            }
+            order = Order.objects.create(
+                user=user,
+                total_amount=sum(prices[line.product_id] * line.quantity for line in lines),
+                items_count=sum(line.quantity for line in lines),
+                payment_method=payment_method,
+                **shipping_data
+            )
+            items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=line.product,
+                    product_title=line.product.title,
+                    product_price=prices[line.product_id],
+                    seller_id=line.product.seller_id,
+                    quantity=line.quantity
+                )
+                for line in lines
+            ])
+            
+            lines[0].cart.touch()
+            # The holds are now sales
+            StockReservation.objects.filter(user=user).delete()
+            # Queued in the outbox, delivered by send_queued_emails once this commits
+            send_order_confirmation_email(order)
+            record_sales(items)
+            transaction.on_commit(lambda: cart_store.invalidate(user))
+    except _StockConflict:
+        raise _stock_shortage_error(user, lines) from None
+    
+    return order
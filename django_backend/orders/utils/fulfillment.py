@@ -0,0 +1,117 @@
+"""
+Seller fulfillment.
+
+Every order item is fulfilled by the seller of its product. Workers claim a
+batch of the oldest pending items of their seller with ``SKIP LOCKED``, so
+any number of them can pull work at once without waiting on each other or
+getting the same items, then move the claimed items to shipped and delivered
+in bulk. The order status follows its items: processing once one is claimed,
+shipped or delivered once all of them are.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import Order, OrderItem
+
+# Item fulfillment status -> statuses it can be reached from
+TRANSITIONS = {
+    'shipped': ['processing'],
+    'delivered': ['shipped'],
+}
+
+# Orders in these states still have items to fulfill
+OPEN_ORDER_STATUSES = ['pending', 'processing', 'shipped']
+
+# Order status -> order statuses it can be moved forward from; cancelled and
+# returned orders are closed and only change through cancellation.close_orders
+ORDER_TRANSITIONS = {
+    'processing': ['pending'],
+    'shipped': ['pending', 'processing'],
+    'delivered': OPEN_ORDER_STATUSES,
+}
+
+
+def seller_items(user):
+    """Order items the user fulfills: their own as a seller, every item as an admin"""
+    if user.role == 'admin':
+        return OrderItem.objects.all()
+    return OrderItem.objects.filter(seller=user)
+
+
+def claim_items(user, limit=20):
+    """
+    Claim up to ``limit`` of the oldest pending items of the user's queue,
+    including items whose claim timed out after FULFILLMENT_CLAIM_TIMEOUT_MINUTES.
+    Returns the claimed items.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(minutes=settings.FULFILLMENT_CLAIM_TIMEOUT_MINUTES)
+    
+    with transaction.atomic():
+        # Lock the items only; rows other workers are claiming are skipped, not waited on
+        item_ids = list(
+            seller_items(user).select_for_update(skip_locked=True, of=('self',)).filter(
+                Q(fulfillment_status='pending') |
+                Q(fulfillment_status='processing', claimed_at__lt=stale_before),
+                order__status__in=['pending', 'processing']
+            ).order_by('created_at').values_list('pk', flat=True)[:limit]
+        )
+        if not item_ids:
+            return []
+        
+        OrderItem.objects.filter(pk__in=item_ids).update(
+            fulfillment_status='processing',
+            claimed_by=user,
+            claimed_at=now
+        )
+        items = list(OrderItem.objects.filter(pk__in=item_ids).select_related('order'))
+        _roll_up_orders({item.order_id for item in items}, now)
+    
+    return items
+
+
+def update_items(user, item_ids, fulfillment_status):
+    """
+    Move the given items of the user's queue to ``fulfillment_status`` with
+    one UPDATE. Items not in a state leading there are left alone. Returns
+    the ids of the items updated.
+    """
+    now = timezone.now()
+    
+    with transaction.atomic():
+        items = seller_items(user).select_for_update(of=('self',)).filter(
+            pk__in=item_ids,
+            fulfillment_status__in=TRANSITIONS[fulfillment_status],
+            order__status__in=OPEN_ORDER_STATUSES
+        )
+        updated = dict(items.values_list('pk', 'order_id'))
+        if not updated:
+            return []
+        
+        OrderItem.objects.filter(pk__in=updated).update(fulfillment_status=fulfillment_status)
+        _roll_up_orders(set(updated.values()), now)
+    
+    return list(updated)
+
+
+def _roll_up_orders(order_ids, now):
+    """Bring the status of the given orders in line with their items, set-based"""
+    orders = Order.objects.filter(pk__in=order_ids, status__in=OPEN_ORDER_STATUSES)
+    
+    # Every item delivered
+    orders.exclude(
+        items__fulfillment_status__in=['pending', 'processing', 'shipped']
+    ).update(status='delivered', is_delivered=True, delivered_at=now, updated_at=now)
+    # Every item at least shipped
+    orders.exclude(status__in=['shipped', 'delivered']).exclude(
+        items__fulfillment_status__in=['pending', 'processing']
+    ).update(status='shipped', updated_at=now)
+    # Work started on one of the items
+    orders.filter(
+        status='pending',
+        items__fulfillment_status__in=['processing', 'shipped', 'delivered']
+    ).update(status='processing', updated_at=now)
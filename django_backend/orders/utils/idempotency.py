@@ -0,0 +1,116 @@
+"""
+Idempotency keys.
+
+Views decorated with ``idempotent`` honor an ``Idempotency-Key`` header:
+the first request for a key claims it by inserting an ``IdempotencyKey``
+row, runs, and stores its response in the same transaction as its own
+changes. Retries with the same key get the stored response back without
+running the view again; a duplicate arriving while the first one is still
+running gets 409. Keys expire after IDEMPOTENCY_KEY_TTL_HOURS.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from ..models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def _request_hash(request):
+    """Fingerprint of the request, so a key can't be reused for a different one"""
+    payload = json.dumps(
+        [request.method, request.path, request.data],
+        sort_keys=True,
+        cls=DjangoJSONEncoder
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _claim(user, scope, key, request_hash):
+    """
+    Claim a key for this request. Returns (record, None) when the view
+    should run, or (None, response) with the response to send instead.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user,
+                    scope=scope,
+                    key=key,
+                    request_hash=request_hash,
+                    expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+                )
+            return record, None
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(user=user, scope=scope, key=key).first()
+        
+        if existing is None:
+            continue
+        abandoned = existing.status_code is None and existing.created_at < stale_before
+        if existing.expires_at <= now or abandoned:
+            # Expired, or its request died without finishing: start over
+            IdempotencyKey.objects.filter(pk=existing.pk).delete()
+            continue
+        if existing.request_hash != request_hash:
+            return None, Response({
+                'error': f'{HEADER} was already used for a different request.'
+            }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if existing.status_code is None:
+            break
+        return None, Response(
+            existing.response_body,
+            status=existing.status_code,
+            headers={'Idempotent-Replayed': 'true'}
+        )
+    
+    return None, Response({
+        'error': f'A request with this {HEADER} is still being processed.'
+    }, status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'})
+
+
+def idempotent(scope):
+    """Decorate an APIView handler to honor the Idempotency-Key header"""
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return handler(view, request, *args, **kwargs)
+            if len(key) > 255:
+                return Response({
+                    'error': f'{HEADER} must be at most 255 characters.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            record, response = _claim(request.user, scope, key, _request_hash(request))
+            if response is not None:
+                return response
+            
+            try:
+                with transaction.atomic():
+                    response = handler(view, request, *args, **kwargs)
+                    if response.status_code < 500:
+                        record.status_code = response.status_code
+                        record.response_body = response.data
+                        record.save(update_fields=['status_code', 'response_body'])
+            except Exception:
+                # Release the key so the client can retry
+                record.delete()
+                raise
+            if response.status_code >= 500:
+                record.delete()
+            return response
+        return wrapper
+    return decorator
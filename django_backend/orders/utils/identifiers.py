@@ -0,0 +1,70 @@
+"""
+Time-ordered identifiers.
+
+``uuid7`` builds RFC 9562 version 7 UUIDs: a 48-bit Unix timestamp in
+milliseconds followed by random bits. Values generated later sort after
+earlier ones, so new rows land at the end of a unique index instead of at
+random places in it, and a time range maps to a range of identifiers.
+"""
+import os
+import re
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+_HEX_PREFIX = re.compile(r'^[0-9a-f]{1,32}$')
+
+# Only the dashed form is a date, parse_date also reads 8 digit hex prefixes like 20240115 as one
+_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+# Shorter hex prefixes match too wide a range to be worth a range scan
+MIN_PREFIX_LENGTH = 8
+
+
+def uuid7(timestamp=None):
+    """New version 7 UUID, for ``timestamp`` (seconds since the epoch) or now"""
+    if timestamp is None:
+        timestamp = timezone.now().timestamp()
+    milliseconds = int(timestamp * 1000) & ((1 << 48) - 1)
+    random_bits = int.from_bytes(os.urandom(10), 'big')
+    value = (
+        milliseconds << 80
+        | 0x7 << 76  # Version
+        | (random_bits >> 68) << 64  # 12 random bits
+        | 0b10 << 62  # Variant
+        | random_bits & ((1 << 62) - 1)  # 62 random bits
+    )
+    return uuid.UUID(int=value)
+
+
+def uuid7_range(start, end):
+    """Lowest and highest version 7 UUIDs that can be generated between two datetimes"""
+    low = int(start.timestamp() * 1000) << 80
+    high = int(end.timestamp() * 1000) << 80 | ((1 << 80) - 1)
+    return uuid.UUID(int=low), uuid.UUID(int=high)
+
+
+def uuid_search_range(term):
+    """
+    Range of UUIDs matching a search term, for a range scan on a UUID index:
+    a hex prefix (dashes allowed) of at least MIN_PREFIX_LENGTH digits matches
+    every UUID starting with it, a date (YYYY-MM-DD) every version 7 UUID
+    generated that day. None otherwise.
+    """
+    term = term.strip().lower()
+    day = None
+    if _DATE.match(term):
+        try:
+            day = parse_date(term)
+        except ValueError:
+            pass
+    if day is not None:
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        return uuid7_range(start, start + timedelta(days=1) - timedelta(milliseconds=1))
+    
+    prefix = term.replace('-', '')
+    if len(prefix) < MIN_PREFIX_LENGTH or not _HEX_PREFIX.match(prefix):
+        return None
+    return uuid.UUID(prefix.ljust(32, '0')), uuid.UUID(prefix.ljust(32, 'f'))
@@ -0,0 +1,131 @@
+"""
+Payment notifications.
+
+The payment provider posts its events to the webhook, signed with
+PAYMENT_WEBHOOK_SECRET: ``X-Payment-Timestamp`` holds the Unix time of the
+delivery and ``X-Payment-Signature`` the hex HMAC-SHA256 of
+``"<timestamp>.<raw body>"``. Verified events are stored as received, once
+per event id, and the webhook answers at once; ``apply_pending_events``
+later applies a batch of them to their orders with one UPDATE.
+
+Event body::
+
+    {"id": "evt_...", "type": "payment.succeeded",
+     "data": {"order_number": "<uuid>", "amount": "12.50"}}
+"""
+import hashlib
+import hmac
+import time
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Order, PaymentEvent
+
+SIGNATURE_HEADER = 'X-Payment-Signature'
+TIMESTAMP_HEADER = 'X-Payment-Timestamp'
+
+
+def sign(body, timestamp, secret=None):
+    """Signature of a webhook body sent at ``timestamp``"""
+    secret = settings.PAYMENT_WEBHOOK_SECRET if secret is None else secret
+    message = f'{timestamp}.'.encode() + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, timestamp, signature):
+    """Check a webhook's signature, and that it was sent recently"""
+    if not settings.PAYMENT_WEBHOOK_SECRET or not timestamp or not signature:
+        return False
+    try:
+        sent_at = int(timestamp)
+    except ValueError:
+        return False
+    if abs(time.time() - sent_at) > settings.PAYMENT_WEBHOOK_TOLERANCE:
+        return False
+    return hmac.compare_digest(sign(body, timestamp), signature)
+
+
+def record_event(payload):
+    """Store a verified event; events already received (provider retries) are ignored"""
+    data = payload.get('data')
+    if not isinstance(data, dict):
+        data = {}
+    try:
+        order_number = uuid.UUID(str(data.get('order_number')))
+    except ValueError:
+        order_number = None
+    
+    # A single INSERT, duplicates are dropped by the unique event id
+    PaymentEvent.objects.bulk_create([
+        PaymentEvent(
+            event_id=payload['id'],
+            event_type=payload['type'],
+            order_number=order_number,
+            payload=payload
+        )
+    ], ignore_conflicts=True)
+
+
+def _amount(event):
+    """Amount of a payment event, None if missing or invalid"""
+    data = event.payload.get('data')
+    if not isinstance(data, dict):
+        return None
+    try:
+        return Decimal(str(data.get('amount')))
+    except InvalidOperation:
+        return None
+
+
+def apply_pending_events(batch_size=100):
+    """
+    Apply one batch of received events to their orders. Returns the number
+    of events processed, 0 when there is nothing pending.
+    """
+    with transaction.atomic():
+        # Skip events another worker is applying
+        events = list(
+            PaymentEvent.objects.select_for_update(skip_locked=True).filter(
+                status='pending'
+            ).order_by('received_at')[:batch_size]
+        )
+        if not events:
+            return 0
+        
+        now = timezone.now()
+        orders = Order.objects.select_for_update().in_bulk(
+            [event.order_number for event in events if event.order_number],
+            field_name='order_number'
+        )
+        paid = set()
+        for event in events:
+            event.processed_at = now
+            order = orders.get(event.order_number)
+            amount = _amount(event)
+            if event.event_type != 'payment.succeeded':
+                event.status, event.result = 'ignored', 'Unhandled event type.'
+            elif order is None:
+                event.status, event.result = 'rejected', 'Unknown order.'
+            elif amount != order.total_amount:
+                event.status, event.result = 'rejected', f'Amount {amount} does not match the order total {order.total_amount}.'
+            elif order.status in ['cancelled', 'returned']:
+                event.status, event.result = 'rejected', f'Order is {order.status}.'
+            elif order.is_paid or order.pk in paid:
+                event.status, event.result = 'ignored', 'Order is already paid.'
+            else:
+                event.status = 'applied'
+                paid.add(order.pk)
+        
+        if paid:
+            Order.objects.filter(pk__in=paid, is_paid=False).update(
+                is_paid=True,
+                paid_at=now,
+                updated_at=now
+            )
+        PaymentEvent.objects.bulk_update(events, ['status', 'result', 'processed_at'])
+    
+    return len(events)
@@ -1,26 +1,35 @@
+import json
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db import transaction
-import logging
 
-from .models import ShippingAddress, Order, OrderItem
+from .models import ShippingAddress, Order, ArchivedOrder
 from .serializers import (
     ShippingAddressSerializer,
     OrderSerializer,
+    OrderSummarySerializer,
+    ArchivedOrderSerializer,
+    ArchivedOrderSummarySerializer,
+    FulfillmentItemSerializer,
+    FulfillmentUpdateSerializer,
     OrderCreateSerializer
 )
-from cart.models import Cart
-from users.utils.email import send_order_confirmation_email
-
-logger = logging.getLogger(__name__)
+from .utils.cancellation import close_orders, CUSTOMER_CANCELLABLE_STATUSES, CUSTOMER_RETURNABLE_STATUSES
+from .utils.checkout import place_order, reserve_cart, release_reservations, CheckoutError
+from .utils.fulfillment import claim_items, seller_items, update_items
+from .utils.idempotency import idempotent
+from .utils.payments import record_event, verify_signature, SIGNATURE_HEADER, TIMESTAMP_HEADER
+from products.views import IsSellerOrAdmin
+from users.authentication import TokenClaimsAuthentication
 
 
 class ShippingAddressListCreateView(generics.ListCreateAPIView):
     """List and create shipping addresses"""
     serializer_class = ShippingAddressSerializer
+    authentication_classes = [TokenClaimsAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
@@ -33,33 +42,52 @@ class ShippingAddressListCreateView(generics.ListCreateAPIView):
 class ShippingAddressDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete a shipping address"""
     serializer_class = ShippingAddressSerializer
+    authentication_classes = [TokenClaimsAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
         return ShippingAddress.objects.filter(user=self.request.user)
 
 
-class OrderCreateView(APIView):
-    """Create an order from cart"""
+class CheckoutStartView(APIView):
+    """Hold the cart's stock while the user completes checkout"""
+    authentication_classes = [TokenClaimsAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
-    @transaction.atomic
     def post(self, request):
-        serializer = OrderCreateSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        
-        # Get user's cart
         try:
-            cart = Cart.objects.get(user=request.user)
-        except Cart.DoesNotExist:
+            reservations = reserve_cart(request.user)
+        except CheckoutError as e:
             return Response({
-                'error': 'Cart is empty.'
+                'error': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        if not cart.items.exists():
-            return Response({
-                'error': 'Cart is empty.'
-            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'message': 'Stock reserved for checkout.',
+            # Sharded products take no holds, so there may be none
+            'expires_at': reservations[0].expires_at if reservations else None,
+            'reservations': [
+                {'product_id': reservation.product_id, 'quantity': reservation.quantity}
+                for reservation in reservations
+            ]
+        }, status=status.HTTP_200_OK)
+    
+    def delete(self, request):
+        release_reservations(request.user)
+        return Response({
+            'message': 'Stock reservations released.'
+        }, status=status.HTTP_200_OK)
+
+
+class OrderCreateView(APIView):
+    """Create an order from cart"""
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @idempotent('order_create')
+    def post(self, request):
+        serializer = OrderCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
         # Get shipping address
         shipping_address_id = serializer.validated_data.get('shipping_address_id')
@@ -88,47 +116,17 @@ class OrderCreateView(APIView):
                 'shipping_postal_code': serializer.validated_data['shipping_postal_code'],
             }
         
-        # Calculate total
-        total_amount = cart.get_total()
-        
-        # Create order
-        order = Order.objects.create(
-            user=request.user,
-            total_amount=total_amount,
-            payment_method=serializer.validated_data['payment_method'],
-            **shipping_data
-        )
-        
-        # Create order items and update stock
-        for cart_item in cart.items.all():
-            # Check stock
-            if cart_item.product.stock_quantity < cart_item.quantity:
-                # Return error response instead of raising exception
-                return Response({
-                    'error': f'Insufficient stock for {cart_item.product.title}. Only {cart_item.product.stock_quantity} available.'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Create order item
-            OrderItem.objects.create(
-                order=order,
-                product=cart_item.product,
-                product_title=cart_item.product.title,
-                product_price=cart_item.product.get_discounted_price(),
-                quantity=cart_item.quantity
-            )
-            
-            # Update stock
-            cart_item.product.stock_quantity -= cart_item.quantity
-            cart_item.product.save()
-        
-        # Clear cart
-        cart.items.all().delete()
-        
-        # Send order confirmation email
+        # Create the order, its items and the stock updates in one transaction
         try:
-            send_order_confirmation_email(order)
-        except Exception as e:
-            logger.error(f"Error sending order confirmation email: {e}")
+            order = place_order(
+                request.user,
+                serializer.validated_data['payment_method'],
+                shipping_data
+            )
+        except CheckoutError as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         order_serializer = OrderSerializer(order)
         return Response({
@@ -138,27 +136,62 @@ class OrderCreateView(APIView):
 
 
 class OrderListView(generics.ListAPIView):
-    """List user's orders"""
-    serializer_class = OrderSerializer
+    """
+    List user's orders as summaries, with their items if ?include=items.
+    Archived orders are listed with ?archived=true.
+    """
+    authentication_classes = [TokenClaimsAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
+    def include_items(self):
+        return self.request.query_params.get('include') == 'items'
+    
+    def archived(self):
+        return self.request.query_params.get('archived') == 'true'
+    
+    def get_serializer_class(self):
+        if self.archived():
+            return ArchivedOrderSerializer if self.include_items() else ArchivedOrderSummarySerializer
+        if self.include_items():
+            return OrderSerializer
+        return OrderSummarySerializer
+    
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        model = ArchivedOrder if self.archived() else Order
+        queryset = model.objects.filter(user=self.request.user).order_by('-created_at')
+        if self.include_items():
+            return queryset.prefetch_related('items')
+        return queryset
 
 
 class OrderDetailView(generics.RetrieveAPIView):
     """Retrieve order details"""
     serializer_class = OrderSerializer
+    authentication_classes = [TokenClaimsAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return Order.objects.filter(user=self.request.user).prefetch_related('items')
+    
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # Finished orders are moved to the archive by archive_orders
+            order = get_object_or_404(
+                ArchivedOrder.objects.prefetch_related('items'),
+                pk=kwargs['pk'],
+                user=request.user
+            )
+            return Response(ArchivedOrderSerializer(order).data)
 
 
 class OrderMarkAsPaidView(APIView):
     """Mark order as paid (simulated payment)"""
+    authentication_classes = [TokenClaimsAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
+    @idempotent('order_pay')
     def post(self, request, pk):
         order = get_object_or_404(Order, id=pk, user=request.user)
         
@@ -176,3 +209,117 @@ class OrderMarkAsPaidView(APIView):
             'message': 'Order marked as paid successfully.',
             'order': order_serializer.data
         }, status=status.HTTP_200_OK)
+
+
+class PaymentWebhookView(APIView):
+    """
+    Receive payment provider events. Verified events are stored and
+    acknowledged at once; process_payment_events applies them to the orders.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    
+    def post(self, request):
+        body = request.body
+        if not verify_signature(body, request.headers.get(TIMESTAMP_HEADER), request.headers.get(SIGNATURE_HEADER)):
+            return Response({
+                'error': 'Invalid signature.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return Response({
+                'error': 'Invalid JSON.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not (isinstance(payload, dict) and isinstance(payload.get('id'), str)
+                and isinstance(payload.get('type'), str) and 0 < len(payload['id']) <= 255
+                and 0 < len(payload['type']) <= 100):
+            return Response({
+                'error': 'Event id and type are required.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        record_event(payload)
+        return Response({'received': True}, status=status.HTTP_200_OK)
+
+
+class OrderCancelView(APIView):
+    """Cancel an order before it ships, restocking its items"""
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    new_status = 'cancelled'
+    from_statuses = CUSTOMER_CANCELLABLE_STATUSES
+    error = 'Only pending or processing orders can be cancelled.'
+    message = 'Order cancelled successfully.'
+    
+    def post(self, request, pk):
+        order = get_object_or_404(Order, id=pk, user=request.user)
+        
+        if not close_orders([order.pk], self.new_status, self.from_statuses):
+            return Response({
+                'error': self.error
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        order = Order.objects.prefetch_related('items').get(pk=order.pk)
+        return Response({
+            'message': self.message,
+            'order': OrderSerializer(order).data
+        }, status=status.HTTP_200_OK)
+
+
+class OrderReturnView(OrderCancelView):
+    """Return a delivered order, restocking its items"""
+    new_status = 'returned'
+    from_statuses = CUSTOMER_RETURNABLE_STATUSES
+    error = 'Only delivered orders can be returned.'
+    message = 'Order returned successfully.'
+
+
+class FulfillmentQueueView(generics.ListAPIView):
+    """List the order items the seller fulfills, ?status=pending by default"""
+    serializer_class = FulfillmentItemSerializer
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [IsSellerOrAdmin]
+    
+    def get_queryset(self):
+        fulfillment_status = self.request.query_params.get('status', 'pending')
+        return seller_items(self.request.user).filter(
+            fulfillment_status=fulfillment_status
+        ).select_related('order').order_by('created_at')
+
+
+class FulfillmentClaimView(APIView):
+    """Claim a batch of pending order items to fulfill"""
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [IsSellerOrAdmin]
+    
+    def post(self, request):
+        try:
+            limit = min(max(int(request.data.get('limit', 20)), 1), 100)
+        except (TypeError, ValueError):
+            return Response({
+                'error': 'limit must be a number.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        items = claim_items(request.user, limit=limit)
+        return Response({
+            'claimed': len(items),
+            'items': FulfillmentItemSerializer(items, many=True).data
+        }, status=status.HTTP_200_OK)
+
+
+class FulfillmentUpdateView(APIView):
+    """Mark claimed order items as shipped, or shipped ones as delivered"""
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [IsSellerOrAdmin]
+    
+    def post(self, request):
+        serializer = FulfillmentUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        item_ids = serializer.validated_data['item_ids']
+        
+        updated = update_items(request.user, item_ids, serializer.validated_data['status'])
+        return Response({
+            'updated': updated,
+            'skipped': sorted(set(item_ids) - set(updated))
+        }, status=status.HTTP_200_OK)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Tag, Brand, Product, ProductImage
+from .models import Category, Tag, Brand, Product, ProductImage, StockReservation
 
 
 class ProductImageInline(admin.TabularInline):
@@ -50,7 +50,7 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('title', 'description', 'category', 'brand', 'tags')
         }),
         ('Pricing & Inventory', {
-            'fields': ('price', 'discount', 'stock_quantity')
+            'fields': ('price', 'discount', 'stock_quantity', 'stock_shard_count')
         }),
         ('Status', {
             'fields': ('seller', 'is_approved', 'is_featured', 'is_active')
@@ -61,7 +61,8 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ['average_rating', 'total_reviews']
+    # Shards are managed with `manage.py rebalance_stock_shards`
+    readonly_fields = ['average_rating', 'total_reviews', 'stock_shard_count']
     
     actions = ['approve_products', 'feature_products', 'unfeature_products', 'deactivate_products']
     
@@ -97,3 +98,14 @@ class ProductImageAdmin(admin.ModelAdmin):
     list_filter = ['is_primary', 'created_at']
     search_fields = ['product__title']
     ordering = ['-created_at']
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    """Stock Reservation Admin"""
+    list_display = ['product', 'user', 'quantity', 'expires_at', 'created_at']
+    list_filter = ['expires_at']
+    search_fields = ['product__title', 'user__email']
+    list_select_related = ['product', 'user']
+    raw_id_fields = ['product', 'user']
+    ordering = ['expires_at']
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from products.models import Product
+from products.utils.stock import rebalance_stock_shards
+
+
+class Command(BaseCommand):
+    help = 'Split hot products\' stock into shards, or even out the shards of sharded products'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', dest='products',
+                            help='Product id to rebalance (repeatable, default: all sharded products)')
+        parser.add_argument('--shards', type=int,
+                            help='Set the number of shards of the given products (0 to stop sharding)')
+    
+    def handle(self, *args, **options):
+        if options['shards'] is not None:
+            if not options['products']:
+                raise CommandError('--shards needs at least one --product.')
+            if options['shards'] < 0:
+                raise CommandError('--shards must be 0 or more.')
+        
+        if options['products']:
+            product_ids = options['products']
+        else:
+            product_ids = Product.objects.filter(stock_shard_count__gt=0).values_list('pk', flat=True)
+        
+        rebalanced = 0
+        for product_id in product_ids:
+            try:
+                total = rebalance_stock_shards(product_id, options['shards'])
+            except Product.DoesNotExist:
+                raise CommandError(f'Product {product_id} does not exist.')
+            rebalanced += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Product {product_id}: {total} in stock.')
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebalanced stock shards of {rebalanced} products.'))
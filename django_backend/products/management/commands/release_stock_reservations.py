@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from products.models import StockReservation
+
+
+class Command(BaseCommand):
+    help = 'Delete expired checkout stock reservations in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of reservations deleted per statement')
+        parser.add_argument('--sleep', type=float, default=0.1,
+                            help='Seconds to pause between batches')
+    
+    def handle(self, *args, **options):
+        # Expired holds already count as released, this only reclaims the rows
+        now = timezone.now()
+        released = 0
+        while True:
+            reservation_ids = list(
+                StockReservation.objects.filter(expires_at__lte=now)
+                .order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not reservation_ids:
+                break
+            deleted, _ = StockReservation.objects.filter(pk__in=reservation_ids).delete()
+            released += deleted
+            if len(reservation_ids) < options['batch_size']:
+                break
+            time.sleep(options['sleep'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired stock reservations.'))
@@ -1,5 +1,9 @@
+from decimal import Decimal, ROUND_HALF_UP
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
@@ -63,12 +67,42 @@ class Brand(models.Model):
         return self.name
 
 
+def effective_stock_expression(prefix=''):
+    """Database expression for a product's stock including its shards"""
+    shard_stock = StockShard.objects.filter(
+        product=OuterRef(f'{prefix}pk')
+    ).values('product').annotate(total=Sum('quantity')).values('total')
+    return F(f'{prefix}stock_quantity') + Coalesce(Subquery(shard_stock), 0)
+
+
+class ProductQuerySet(models.QuerySet):
+    """Product QuerySet"""
+    def with_effective_stock(self):
+        """Annotate ``effective_stock``: stock including the product's shards"""
+        return self.annotate(effective_stock=effective_stock_expression())
+    
+    def with_available_stock(self, exclude_user=None):
+        """Annotate ``available_stock``: stock minus active checkout reservations"""
+        held = StockReservation.objects.filter(
+            product=OuterRef('pk'),
+            expires_at__gt=timezone.now()
+        )
+        if exclude_user is not None:
+            held = held.exclude(user=exclude_user)
+        held = held.values('product').annotate(total=Sum('quantity')).values('total')
+        return self.with_effective_stock().annotate(
+            available_stock=F('effective_stock') - Coalesce(Subquery(held), 0)
+        )
+
+
 class Product(models.Model):
     """Product Model"""
     title = models.CharField(max_length=255)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     stock_quantity = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    # Hot products can split their stock across StockShard rows, see rebalance_stock_shards
+    stock_shard_count = models.PositiveSmallIntegerField(default=0)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='products')
     tags = models.ManyToManyField(Tag, related_name='products', blank=True)
     brand = models.ForeignKey(Brand, on_delete=models.SET_NULL, null=True, blank=True, related_name='products')
@@ -87,6 +121,8 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('product')
         verbose_name_plural = _('products')
@@ -100,15 +136,35 @@ class Product(models.Model):
         return self.title
     
     def get_discounted_price(self):
-        """Calculate discounted price"""
+        """Calculate discounted price, rounded to cents"""
         if self.discount > 0:
             discount_amount = (self.price * self.discount) / 100
-            return self.price - discount_amount
+            return (self.price - discount_amount).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
         return self.price
     
     def is_in_stock(self):
         """Check if product is in stock"""
-        return self.stock_quantity > 0
+        return self.get_effective_stock() > 0
+    
+    def get_effective_stock(self):
+        """Get stock including the product's shards"""
+        if hasattr(self, 'effective_stock'):
+            return self.effective_stock
+        if not self.stock_shard_count:
+            return self.stock_quantity
+        return self.stock_quantity + (self.shards.aggregate(total=Sum('quantity'))['total'] or 0)
+    
+    def get_available_stock(self):
+        """Get stock not held by active checkout reservations"""
+        if hasattr(self, 'available_stock'):
+            return self.available_stock
+        if hasattr(self, 'active_reservations'):
+            held = sum(reservation.quantity for reservation in self.active_reservations)
+        else:
+            held = self.reservations.filter(
+                expires_at__gt=timezone.now()
+            ).aggregate(total=Sum('quantity'))['total'] or 0
+        return self.get_effective_stock() - held
     
     def update_rating(self):
         """Update average rating from reviews"""
@@ -144,3 +200,43 @@ class ProductImage(models.Model):
         if self.is_primary:
             ProductImage.objects.filter(product=self.product, is_primary=True).update(is_primary=False)
         super().save(*args, **kwargs)
+
+
+class StockReservation(models.Model):
+    """Stock held for a user's checkout until it expires"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='stock_reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('stock reservation')
+        verbose_name_plural = _('stock reservations')
+        ordering = ['expires_at']
+        indexes = [
+            # Sum of active holds per product, see ProductQuerySet.with_available_stock
+            models.Index(fields=['product', 'expires_at']),
+            models.Index(fields=['expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.product.title} held for {self.user.email}"
+
+
+class StockShard(models.Model):
+    """Slice of a hot product's stock, so checkouts decrement different rows"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='shards')
+    index = models.PositiveSmallIntegerField()
+    quantity = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    
+    class Meta:
+        verbose_name = _('stock shard')
+        verbose_name_plural = _('stock shards')
+        ordering = ['product', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'index'], name='unique_stock_shard_index'),
+        ]
+    
+    def __str__(self):
+        return f"Shard {self.index} of {self.product.title}: {self.quantity}"
@@ -41,12 +41,13 @@ class ProductListSerializer(serializers.ModelSerializer):
     brand = BrandSerializer(read_only=True)
     seller_name = serializers.SerializerMethodField()
     discounted_price = serializers.SerializerMethodField()
+    available_stock = serializers.SerializerMethodField()
     primary_image = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
         fields = ['id', 'title', 'price', 'discounted_price', 'discount', 'stock_quantity',
-                  'category', 'brand', 'seller_name', 'is_featured', 'average_rating',
+                  'available_stock', 'category', 'brand', 'seller_name', 'is_featured', 'average_rating',
                   'total_reviews', 'primary_image', 'created_at']
         read_only_fields = ['id', 'seller_name', 'average_rating', 'total_reviews', 'created_at']
     
@@ -56,8 +57,15 @@ class ProductListSerializer(serializers.ModelSerializer):
     def get_discounted_price(self, obj):
         return float(obj.get_discounted_price())
     
+    def get_available_stock(self, obj):
+        return obj.get_available_stock()
+    
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
+        # Use the primary image prefetched by the caller, if any
+        if hasattr(obj, 'primary_images'):
+            primary_image = obj.primary_images[0] if obj.primary_images else None
+        else:
+            primary_image = obj.images.filter(is_primary=True).first()
         if primary_image:
             return self.context['request'].build_absolute_uri(primary_image.image.url)
         return None
@@ -71,12 +79,13 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     seller = serializers.SerializerMethodField()
     images = ProductImageSerializer(many=True, read_only=True)
     discounted_price = serializers.SerializerMethodField()
+    available_stock = serializers.SerializerMethodField()
     in_stock = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
         fields = ['id', 'title', 'description', 'price', 'discounted_price', 'discount',
-                  'stock_quantity', 'in_stock', 'category', 'tags', 'brand', 'seller',
+                  'stock_quantity', 'available_stock', 'in_stock', 'category', 'tags', 'brand', 'seller',
                   'images', 'is_featured', 'average_rating', 'total_reviews',
                   'created_at', 'updated_at']
         read_only_fields = ['id', 'seller', 'average_rating', 'total_reviews',
@@ -92,6 +101,9 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     def get_discounted_price(self, obj):
         return float(obj.get_discounted_price())
     
+    def get_available_stock(self, obj):
+        return obj.get_available_stock()
+    
     def get_in_stock(self, obj):
         return obj.is_in_stock()
 
@@ -9,6 +9,7 @@ from .views import (
     ProductUpdateView,
     ProductDeleteView,
     SellerProductListView,
+    SellerDashboardView,
     FeaturedProductsView,
     LatestProductsView,
     ProductImageUploadView,
@@ -27,6 +28,7 @@ urlpatterns = [
     path('featured/', FeaturedProductsView.as_view(), name='featured_products'),
     path('latest/', LatestProductsView.as_view(), name='latest_products'),
     path('seller/my-products/', SellerProductListView.as_view(), name='seller_products'),
+    path('seller/dashboard/', SellerDashboardView.as_view(), name='seller_dashboard'),
     path('create/', ProductCreateView.as_view(), name='product_create'),
     path('<int:pk>/', ProductDetailView.as_view(), name='product_detail'),
     path('<int:pk>/update/', ProductUpdateView.as_view(), name='product_update'),
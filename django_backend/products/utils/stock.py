@@ -0,0 +1,78 @@
+"""
+Sharded stock.
+
+A hot product's stock can be split across ``StockShard`` rows. Its stock is
+then ``stock_quantity`` (the unsharded pool, normally 0 after a rebalance)
+plus the sum of its shards. Checkouts decrement one random shard, so
+concurrent orders for the same product mostly lock different rows.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import F
+
+from ..models import Product, StockShard
+
+
+def take_sharded_stock(product_id, quantity, shard_count):
+    """
+    Decrement a sharded product's stock by ``quantity``. Must run inside a
+    transaction. Returns False, changing nothing, if there isn't enough.
+    """
+    # Try the shards in random order, each with a conditional update
+    for index in random.sample(range(shard_count), shard_count):
+        taken = StockShard.objects.filter(
+            product_id=product_id,
+            index=index,
+            quantity__gte=quantity
+        ).update(quantity=F('quantity') - quantity)
+        if taken:
+            return True
+    
+    # No single shard covers the line: lock the pool and all shards and take from each
+    product = Product.objects.select_for_update().only('stock_quantity').get(pk=product_id)
+    shards = list(StockShard.objects.select_for_update().filter(product_id=product_id).order_by('index'))
+    if product.stock_quantity + sum(shard.quantity for shard in shards) < quantity:
+        return False
+    
+    remaining = quantity
+    for shard in shards:
+        taken = min(shard.quantity, remaining)
+        shard.quantity -= taken
+        remaining -= taken
+    StockShard.objects.bulk_update(shards, ['quantity'])
+    if remaining:
+        Product.objects.filter(pk=product_id).update(stock_quantity=F('stock_quantity') - remaining)
+    return True
+
+
+@transaction.atomic
+def rebalance_stock_shards(product_id, shard_count=None):
+    """
+    Spread a product's stock evenly over ``shard_count`` shards (its current
+    count by default), folding in the pool. A count of 0 moves all stock back
+    to ``stock_quantity`` and removes the shards. Returns the total stock.
+    """
+    product = Product.objects.select_for_update().get(pk=product_id)
+    shards = list(StockShard.objects.select_for_update().filter(product=product))
+    total = product.stock_quantity + sum(shard.quantity for shard in shards)
+    if shard_count is None:
+        shard_count = product.stock_shard_count
+    
+    StockShard.objects.filter(product=product, index__gte=shard_count).delete()
+    if shard_count == 0:
+        Product.objects.filter(pk=product.pk).update(stock_quantity=total, stock_shard_count=0)
+        return total
+    
+    share, extra = divmod(total, shard_count)
+    StockShard.objects.bulk_create(
+        [
+            StockShard(product=product, index=index, quantity=share + (1 if index < extra else 0))
+            for index in range(shard_count)
+        ],
+        update_conflicts=True,
+        unique_fields=['product', 'index'],
+        update_fields=['quantity']
+    )
+    Product.objects.filter(pk=product.pk).update(stock_quantity=0, stock_shard_count=shard_count)
+    return total
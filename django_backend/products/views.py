@@ -1,9 +1,14 @@
 from rest_framework import generics, permissions, filters, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q, Sum
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
+from analytics.models import ProductSales, SalesRollup, SellerSales
+from users.authentication import TokenClaimsAuthentication
 from .models import Category, Tag, Brand, Product, ProductImage
 from .serializers import (
     CategorySerializer,
@@ -65,7 +70,7 @@ class ProductListView(generics.ListAPIView):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        queryset = Product.objects.filter(is_approved=True, is_active=True)
+        queryset = Product.objects.with_available_stock().filter(is_approved=True, is_active=True)
         
         # Filter by category
         category_id = self.request.query_params.get('category')
@@ -109,12 +114,13 @@ class ProductDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        return Product.objects.filter(is_approved=True, is_active=True)
+        return Product.objects.with_available_stock().filter(is_approved=True, is_active=True)
 
 
 class ProductCreateView(generics.CreateAPIView):
     """Create a new product"""
     serializer_class = ProductCreateUpdateSerializer
+    authentication_classes = [TokenClaimsAuthentication]
     permission_classes = [IsSellerOrAdmin]
 
 
@@ -142,12 +148,84 @@ class ProductDeleteView(generics.DestroyAPIView):
 class SellerProductListView(generics.ListAPIView):
     """List products for the logged-in seller"""
     serializer_class = ProductListSerializer
+    authentication_classes = [TokenClaimsAuthentication]
     permission_classes = [IsSellerOrAdmin]
     
     def get_queryset(self):
+        queryset = Product.objects.with_available_stock()
         if self.request.user.role == 'admin':
-            return Product.objects.all()
-        return Product.objects.filter(seller=self.request.user)
+            return queryset
+        return queryset.filter(seller=self.request.user)
+
+
+class SellerDashboardView(APIView):
+    """Sales, top products and low stock items of the logged-in seller (admins pass ?seller=<id>)"""
+    authentication_classes = [TokenClaimsAuthentication]
+    permission_classes = [IsSellerOrAdmin]
+    
+    def get(self, request):
+        seller_id = request.user.pk
+        if request.user.role == 'admin' and 'seller' in request.query_params:
+            try:
+                seller_id = int(request.query_params['seller'])
+            except ValueError:
+                return Response({
+                    'error': 'seller must be a user id.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Lifetime counters, kept up to date at checkout
+        sales = SellerSales.objects.filter(seller_id=seller_id).first()
+        
+        # Daily rollups of the last 30 days
+        recent = SalesRollup.objects.filter(
+            period='day',
+            dimension='seller',
+            key=seller_id,
+            bucket__gte=timezone.now() - timedelta(days=30)
+        ).aggregate(
+            total_revenue=Sum('revenue'),
+            total_orders=Sum('orders_count'),
+            total_units=Sum('units')
+        )
+        
+        top_products = ProductSales.objects.filter(
+            seller_id=seller_id
+        ).select_related('product').order_by('-revenue')[:5]
+        
+        low_stock = Product.objects.filter(
+            seller_id=seller_id,
+            is_active=True
+        ).with_effective_stock().filter(
+            effective_stock__lte=settings.SELLER_LOW_STOCK_THRESHOLD
+        ).order_by('effective_stock')[:10]
+        
+        return Response({
+            'revenue': sales.revenue if sales else 0,
+            'orders_count': sales.orders_count if sales else 0,
+            'units': sales.units if sales else 0,
+            'last_30_days': {
+                'revenue': recent['total_revenue'] or 0,
+                'orders_count': recent['total_orders'] or 0,
+                'units': recent['total_units'] or 0,
+            },
+            'top_products': [
+                {
+                    'id': row.product_id,
+                    'title': row.product.title,
+                    'revenue': row.revenue,
+                    'units': row.units,
+                }
+                for row in top_products
+            ],
+            'low_stock': [
+                {
+                    'id': product.id,
+                    'title': product.title,
+                    'stock': product.effective_stock,
+                }
+                for product in low_stock
+            ],
+        })
 
 
 class FeaturedProductsView(generics.ListAPIView):
@@ -156,7 +234,7 @@ class FeaturedProductsView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        return Product.objects.filter(
+        return Product.objects.with_available_stock().filter(
             is_approved=True,
             is_active=True,
             is_featured=True
@@ -169,7 +247,7 @@ class LatestProductsView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        return Product.objects.filter(
+        return Product.objects.with_available_stock().filter(
             is_approved=True,
             is_active=True
         ).order_by('-created_at')[:20]
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
-from .models import User, UserProfile
+from django.utils import timezone
+from .models import User, UserProfile, OutboundEmail, RevokedToken
 
 
 @admin.register(User)
@@ -37,3 +38,37 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_filter = ['country', 'created_at']
     search_fields = ['user__email', 'city', 'country']
     ordering = ['-created_at']
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    """Outbound Email Admin"""
+    list_display = ['subject', 'to', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['to', 'subject']
+    ordering = ['-created_at']
+    readonly_fields = ['attempts', 'last_error', 'created_at', 'sent_at']
+    
+    actions = ['retry_emails']
+    
+    def retry_emails(self, request, queryset):
+        """Queue selected failed emails again"""
+        updated = queryset.filter(status='failed').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} emails were queued again.')
+    retry_emails.short_description = 'Retry selected failed emails'
+
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    """Revoked Token Admin"""
+    list_display = ['jti', 'revoked_at', 'expires_at']
+    search_fields = ['jti']
+    ordering = ['-revoked_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,50 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .utils.revocation import is_revoked
+from .utils.user_cache import changed_at, claims_user, get_user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication resolving the user from the user cache instead of
+    querying the database on every request, and refusing revoked tokens
+    """
+    
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token.get(api_settings.JTI_CLAIM)):
+            raise InvalidToken(_('Token has been revoked'))
+        return validated_token
+    
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+    
+    def get_user(self, validated_token):
+        user = get_user(self.get_user_id(validated_token))
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
+
+class TokenClaimsAuthentication(CachedJWTAuthentication):
+    """
+    JWT authentication for views that only need the user's id and role: the
+    user is built from the token's claims, its other fields are loaded on
+    first access. Tokens without a role claim, or issued before the user's
+    role or active flag changed, fall back to the cached user.
+    """
+    
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        role = validated_token.get('role')
+        if role is None or validated_token.get('iat', 0) <= changed_at(user_id):
+            return super().get_user(validated_token)
+        return claims_user(user_id, role)
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from users.utils.revocation import prune_revoked_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked tokens that have expired, in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of tokens deleted per statement')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running, pruning every INTERVAL seconds')
+    
+    def handle(self, *args, **options):
+        while True:
+            pruned = prune_revoked_tokens(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} expired revoked tokens.'))
+            
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
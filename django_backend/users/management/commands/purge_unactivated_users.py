@@ -0,0 +1,36 @@
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Delete accounts never activated within ACTIVATION_TOKEN_LIFETIME, in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of accounts deleted per statement')
+    
+    def handle(self, *args, **options):
+        expired_before = timezone.now() - timedelta(hours=settings.ACTIVATION_TOKEN_LIFETIME)
+        # Activation clears the token; staff accounts are never swept
+        expired = User.objects.filter(
+            is_active=False,
+            activation_token__isnull=False,
+            activation_token_created__lt=expired_before,
+            last_login__isnull=True,
+            is_staff=False,
+            is_superuser=False
+        )
+        purged = 0
+        while True:
+            user_ids = list(expired.order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not user_ids:
+                break
+            User.objects.filter(pk__in=user_ids).delete()
+            purged += len(user_ids)
+        
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} unactivated accounts.'))
@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from users.utils.outbox import deliver_pending, is_circuit_open
+
+
+class Command(BaseCommand):
+    help = 'Deliver emails waiting in the outbox, one backend connection per batch'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Maximum number of emails sent per connection')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running, polling the outbox every INTERVAL seconds')
+    
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            while True:
+                attempted = deliver_pending(batch_size=options['batch_size'])
+                if not attempted:
+                    break
+                total += attempted
+            
+            if total:
+                self.stdout.write(self.style.SUCCESS(f'Attempted delivery of {total} emails.'))
+            if is_circuit_open():
+                self.stdout.write(self.style.WARNING('Email backend is failing, delivery is paused.'))
+            
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
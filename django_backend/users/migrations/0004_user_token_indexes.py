@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-19 06:04
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='activation_token',
+            field=models.UUIDField(blank=True, db_index=True, default=uuid.uuid4, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='reset_password_token',
+            field=models.UUIDField(blank=True, db_index=True, default=uuid.uuid4, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_active', 'activation_token_created'], name='users_user_is_acti_aeba44_idx'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
@@ -27,9 +28,9 @@ class User(AbstractUser):
     is_active = models.BooleanField(default=False)  # Requires email activation
     
     # Token fields for activation and password reset
-    activation_token = models.UUIDField(default=uuid.uuid4, editable=False, null=True, blank=True)
+    activation_token = models.UUIDField(default=uuid.uuid4, editable=False, null=True, blank=True, db_index=True)
     activation_token_created = models.DateTimeField(null=True, blank=True)
-    reset_password_token = models.UUIDField(default=uuid.uuid4, editable=False, null=True, blank=True)
+    reset_password_token = models.UUIDField(default=uuid.uuid4, editable=False, null=True, blank=True, db_index=True)
     reset_password_token_created = models.DateTimeField(null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
@@ -42,6 +43,10 @@ class User(AbstractUser):
         verbose_name = _('user')
         verbose_name_plural = _('users')
         ordering = ['-created_at']
+        indexes = [
+            # `manage.py purge_unactivated_users` looks for expired activations
+            models.Index(fields=['is_active', 'activation_token_created']),
+        ]
     
     def __str__(self):
         return self.email
@@ -50,17 +55,17 @@ class User(AbstractUser):
         return f"{self.first_name} {self.last_name}"
     
     def is_activation_token_valid(self):
-        """Check if activation token is still valid (24 hours)"""
+        """Check if activation token is still valid (ACTIVATION_TOKEN_LIFETIME hours)"""
         if not self.activation_token_created:
             return False
-        expiry_time = self.activation_token_created + timedelta(hours=24)
+        expiry_time = self.activation_token_created + timedelta(hours=settings.ACTIVATION_TOKEN_LIFETIME)
         return timezone.now() < expiry_time
     
     def is_reset_password_token_valid(self):
-        """Check if reset password token is still valid (1 hour)"""
+        """Check if reset password token is still valid (RESET_PASSWORD_TOKEN_LIFETIME hours)"""
         if not self.reset_password_token_created:
             return False
-        expiry_time = self.reset_password_token_created + timedelta(hours=1)
+        expiry_time = self.reset_password_token_created + timedelta(hours=settings.RESET_PASSWORD_TOKEN_LIFETIME)
         return timezone.now() < expiry_time
 
 
@@ -83,3 +88,61 @@ class UserProfile(models.Model):
     
     def __str__(self):
         return f"Profile of {self.user.email}"
+
+
+class OutboundEmail(models.Model):
+    """
+    Email waiting in the outbox. Rows are written in the caller's transaction
+    and delivered by `manage.py send_queued_emails`.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    # When a worker took the email for sending
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('outbound email')
+        verbose_name_plural = _('outbound emails')
+        ordering = ['-created_at']
+        indexes = [
+            # The worker polls pending emails that are due
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} to {self.to} ({self.status})"
+
+
+class RevokedToken(models.Model):
+    """
+    JWT revoked before its expiry, by logout or refresh token rotation.
+    Rows are only needed until the token expires, `manage.py prune_revoked_tokens`
+    deletes them after that.
+    """
+    jti = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = _('revoked token')
+        verbose_name_plural = _('revoked tokens')
+        ordering = ['-revoked_at']
+    
+    def __str__(self):
+        return self.jti
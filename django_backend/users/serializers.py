@@ -1,7 +1,11 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from .models import UserProfile
+from .utils.revocation import is_revoked, revoke_token
 import uuid
 from django.utils import timezone
 
@@ -132,3 +136,39 @@ class ChangePasswordSerializer(serializers.Serializer):
         if not user.check_password(value):
             raise serializers.ValidationError("Old password is incorrect.")
         return value
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """
+    Token Refresh Serializer refusing revoked refresh tokens, revoking rotated
+    ones and putting the user's current role in the new tokens
+    """
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            # Revoked before rotating, so two requests can't both rotate the same token
+            usable = revoke_token(refresh)
+        else:
+            usable = not is_revoked(refresh[api_settings.JTI_CLAIM])
+        if not usable:
+            raise InvalidToken('Token has been revoked')
+        
+        user = User.objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.get(api_settings.USER_ID_CLAIM)}
+        ).only('pk', 'role', 'is_active').first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        
+        # The role may have changed since login, and the new access token's
+        # claims are trusted on their own (see TokenClaimsAuthentication)
+        refresh['role'] = user.role
+        data = {'access': str(refresh.access_token)}
+        
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        
+        return data
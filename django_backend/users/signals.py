@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .utils.user_cache import CLAIM_FIELDS, invalidate_user
+
+User = get_user_model()
+
+
+def _invalidate(pk, claims_changed):
+    # Again after commit, in case a request cached the old row in the meantime
+    invalidate_user(pk, claims_changed)
+    transaction.on_commit(lambda: invalidate_user(pk, claims_changed))
+
+
+@receiver(pre_save, sender=User)
+def remember_claim_fields(sender, instance, update_fields=None, **kwargs):
+    """Note whether the save changes the role or active flag carried by tokens"""
+    instance._claims_changed = False
+    if instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(CLAIM_FIELDS):
+        return
+    old = User.objects.filter(pk=instance.pk).values(*CLAIM_FIELDS).first()
+    instance._claims_changed = old is not None and any(
+        old[field] != getattr(instance, field) for field in CLAIM_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_saved_user(sender, instance, created, **kwargs):
+    if not created:
+        _invalidate(instance.pk, getattr(instance, '_claims_changed', False))
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    _invalidate(instance.pk, True)
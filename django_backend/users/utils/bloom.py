@@ -0,0 +1,39 @@
+"""
+Bloom filter.
+
+A fixed-size bit array answering "possibly added" or "definitely not added"
+for strings. It is sized for ``capacity`` items at the given false positive
+rate; past that the error rate climbs, so callers rebuild it bigger.
+"""
+import hashlib
+import math
+
+
+class BloomFilter:
+    """Set membership with false positives but no false negatives"""
+    
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, item):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+    
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+    
+    @property
+    def is_full(self):
+        return self.count >= self.capacity
@@ -1,11 +1,17 @@
-from django.core.mail import send_mail
 from django.conf import settings
+from django.template.defaultfilters import pluralize
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+from .outbox import queue_email
+
+
+def _hours(hours):
+    """Token lifetime as written in emails, e.g. 1 hour or 24 hours"""
+    return f"{hours} hour{pluralize(hours)}"
 
 
 def send_activation_email(user, token):
-    """Send account activation email"""
+    """Queue account activation email"""
     activation_url = f"{settings.FRONTEND_URL}/activate/{token}"
     
     subject = 'Activate Your E-commerce Account'
@@ -16,7 +22,7 @@ def send_activation_email(user, token):
             <p>Hi {user.first_name},</p>
             <p>Thank you for registering. Please click the link below to activate your account:</p>
             <p><a href="{activation_url}">{activation_url}</a></p>
-            <p>This link will expire in 24 hours.</p>
+            <p>This link will expire in {_hours(settings.ACTIVATION_TOKEN_LIFETIME)}.</p>
             <p>If you didn't create an account, please ignore this email.</p>
             <br>
             <p>Best regards,<br>E-commerce Team</p>
@@ -25,18 +31,11 @@ def send_activation_email(user, token):
     """
     plain_message = strip_tags(html_message)
     
-    send_mail(
-        subject,
-        plain_message,
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        html_message=html_message,
-        fail_silently=False,
-    )
+    queue_email(user.email, subject, plain_message, html_message)
 
 
 def send_password_reset_email(user, token):
-    """Send password reset email"""
+    """Queue password reset email"""
     reset_url = f"{settings.FRONTEND_URL}/reset-password/{token}"
     
     subject = 'Password Reset Request'
@@ -47,7 +46,7 @@ def send_password_reset_email(user, token):
             <p>Hi {user.first_name},</p>
             <p>We received a request to reset your password. Click the link below to reset it:</p>
             <p><a href="{reset_url}">{reset_url}</a></p>
-            <p>This link will expire in 1 hour.</p>
+            <p>This link will expire in {_hours(settings.RESET_PASSWORD_TOKEN_LIFETIME)}.</p>
             <p>If you didn't request a password reset, please ignore this email.</p>
             <br>
             <p>Best regards,<br>E-commerce Team</p>
@@ -56,18 +55,11 @@ def send_password_reset_email(user, token):
     """
     plain_message = strip_tags(html_message)
     
-    send_mail(
-        subject,
-        plain_message,
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        html_message=html_message,
-        fail_silently=False,
-    )
+    queue_email(user.email, subject, plain_message, html_message)
 
 
 def send_order_confirmation_email(order):
-    """Send order confirmation email"""
+    """Queue order confirmation email"""
     subject = f'Order Confirmation - {order.order_number}'
     html_message = f"""
     <html>
@@ -89,18 +81,11 @@ def send_order_confirmation_email(order):
     """
     plain_message = strip_tags(html_message)
     
-    send_mail(
-        subject,
-        plain_message,
-        settings.DEFAULT_FROM_EMAIL,
-        [order.user.email],
-        html_message=html_message,
-        fail_silently=False,
-    )
+    queue_email(order.user.email, subject, plain_message, html_message)
 
 
 def send_order_status_email(order):
-    """Send order status update email"""
+    """Queue order status update email"""
     subject = f'Order Status Update - {order.order_number}'
     html_message = f"""
     <html>
@@ -118,11 +103,4 @@ def send_order_status_email(order):
     """
     plain_message = strip_tags(html_message)
     
-    send_mail(
-        subject,
-        plain_message,
-        settings.DEFAULT_FROM_EMAIL,
-        [order.user.email],
-        html_message=html_message,
-        fail_silently=False,
-    )
+    queue_email(order.user.email, subject, plain_message, html_message)
@@ -0,0 +1,159 @@
+"""
+Email outbox.
+
+Transactional emails are saved as ``OutboundEmail`` rows in the caller's
+transaction, so they are only sent if it commits and never slow down the
+request. ``deliver_pending`` sends a batch of due emails over a single
+backend connection, retrying failures with exponential backoff. Repeated
+batch failures open a circuit breaker (kept in the cache so every worker
+sees it) that pauses delivery for EMAIL_CIRCUIT_BREAKER_COOLDOWN seconds.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+FAILURES_KEY = 'email:outbox:failures'
+CIRCUIT_OPEN_KEY = 'email:outbox:circuit_open'
+
+
+def queue_email(to, subject, body, html_body=''):
+    """Add an email to the outbox, in the current transaction if there is one"""
+    return OutboundEmail.objects.create(to=to, subject=subject, body=body, html_body=html_body)
+
+
+def is_circuit_open():
+    """Check if delivery is paused after repeated failures"""
+    return bool(cache.get(CIRCUIT_OPEN_KEY))
+
+
+def _record_batch(succeeded):
+    """Count consecutive failed batches, opening the circuit past the threshold"""
+    if succeeded:
+        cache.delete(FAILURES_KEY)
+        return
+    cache.add(FAILURES_KEY, 0, None)
+    failures = cache.incr(FAILURES_KEY)
+    if failures >= settings.EMAIL_CIRCUIT_BREAKER_THRESHOLD:
+        cache.set(CIRCUIT_OPEN_KEY, True, settings.EMAIL_CIRCUIT_BREAKER_COOLDOWN)
+        cache.delete(FAILURES_KEY)
+        logger.error(
+            f"Email delivery failed {failures} times in a row, "
+            f"pausing for {settings.EMAIL_CIRCUIT_BREAKER_COOLDOWN} seconds"
+        )
+
+
+def _backoff(attempts):
+    """Delay before the next attempt: exponential, capped, with jitter"""
+    delay = min(settings.EMAIL_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.EMAIL_RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _fail(email, error, now):
+    """Record a failed attempt, scheduling a retry or giving up"""
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.next_attempt_at = now + _backoff(email.attempts)
+
+
+def _claim_batch(batch_size):
+    """
+    Mark a batch of due emails (and emails whose sender timed out) as being
+    sent, in a short transaction of its own. Returns the claimed emails.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Skip rows another worker is claiming
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True).filter(
+                Q(status='pending', next_attempt_at__lte=now) |
+                Q(status='sending', claimed_at__lt=now - timedelta(seconds=settings.EMAIL_SENDING_TIMEOUT))
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        if emails:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                status='sending',
+                claimed_at=now
+            )
+    for email in emails:
+        email.status, email.claimed_at = 'sending', now
+    return emails
+
+
+def _record(email, now):
+    """Save the result of one send attempt, unless the claim was taken over meanwhile"""
+    if email.status == 'sending':
+        email.status = 'pending'
+    OutboundEmail.objects.filter(pk=email.pk, status='sending', claimed_at=email.claimed_at).update(
+        status=email.status,
+        attempts=email.attempts,
+        next_attempt_at=email.next_attempt_at,
+        last_error=email.last_error,
+        sent_at=email.sent_at,
+        claimed_at=None
+    )
+
+
+def deliver_pending(batch_size=100):
+    """
+    Send one batch of due emails. Returns the number of emails attempted,
+    0 when there is nothing due or the circuit breaker is open.
+    
+    The batch is claimed and committed first, so no row lock or transaction
+    is held while talking to the mail server; each result is then saved on
+    its own.
+    """
+    if is_circuit_open():
+        return 0
+    
+    emails = _claim_batch(batch_size)
+    if not emails:
+        return 0
+    
+    sent = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        now = timezone.now()
+        for email in emails:
+            _fail(email, e, now)
+            _record(email, now)
+    else:
+        for email in emails:
+            message = EmailMultiAlternatives(
+                email.subject,
+                email.body,
+                settings.DEFAULT_FROM_EMAIL,
+                [email.to],
+                connection=connection
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, 'text/html')
+            now = timezone.now()
+            try:
+                message.send()
+            except Exception as e:
+                _fail(email, e, now)
+            else:
+                email.status = 'sent'
+                email.sent_at = now
+                sent += 1
+            _record(email, now)
+        connection.close()
+    
+    _record_batch(succeeded=sent > 0)
+    return len(emails)
@@ -0,0 +1,75 @@
+"""
+Password verification for logins.
+
+Hashing is deliberately slow, so logins hash on a small thread pool of
+LOGIN_HASH_WORKERS threads: a burst of attempts can't take more than that
+many cores from the other requests. At most LOGIN_HASH_MAX_PENDING checks
+wait for the pool; past that ``PasswordCheckBusy`` is raised after
+LOGIN_HASH_WAIT_SECONDS. Unknown accounts are checked against a dummy hash,
+so they take as long as real ones. Passwords stored with an outdated hasher
+or parameters are rehashed with the current ones on a successful login.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.utils.crypto import get_random_string
+
+_lock = threading.Lock()
+_pool = {}
+
+
+class PasswordCheckBusy(Exception):
+    """Too many password checks are already waiting"""
+    pass
+
+
+def _get_pool():
+    with _lock:
+        if not _pool:
+            _pool['executor'] = ThreadPoolExecutor(
+                max_workers=settings.LOGIN_HASH_WORKERS,
+                thread_name_prefix='password-hash'
+            )
+            _pool['slots'] = threading.BoundedSemaphore(settings.LOGIN_HASH_MAX_PENDING)
+            _pool['dummy_hash'] = make_password(get_random_string(32))
+        return _pool
+
+
+def _needs_rehash(encoded):
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = get_hasher()
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def _verify(password, encoded):
+    """Check the password, with its new hash if the stored one is outdated"""
+    if not check_password(password, encoded):
+        return False, None
+    return True, make_password(password) if _needs_rehash(encoded) else None
+
+
+def verify_password(user, password):
+    """
+    Check the password of ``user`` (None for an unknown account) on the hashing
+    pool, rehashing it if needed. Raises PasswordCheckBusy if the pool is saturated.
+    """
+    pool = _get_pool()
+    if not pool['slots'].acquire(timeout=settings.LOGIN_HASH_WAIT_SECONDS):
+        raise PasswordCheckBusy()
+    try:
+        if user is None or not user.has_usable_password():
+            pool['executor'].submit(check_password, password, pool['dummy_hash']).result()
+            return False
+        valid, new_hash = pool['executor'].submit(_verify, password, user.password).result()
+    finally:
+        pool['slots'].release()
+    
+    if new_hash:
+        user.password = new_hash
+        user.save(update_fields=['password'])
+    return valid
@@ -0,0 +1,120 @@
+"""
+Token revocation.
+
+Revoked JWTs are stored by jti as ``RevokedToken`` rows until they expire.
+Every process keeps a Bloom filter of the revoked jtis, so checking a token
+costs no query: a miss means the token isn't revoked, and only a hit (a
+revoked token or a rare false positive) is confirmed in the database.
+
+The filter picks up tokens revoked by other processes every
+REVOCATION_FILTER_REFRESH_SECONDS with one query for the latest rows, and is
+rebuilt from the table when it fills up or is REVOCATION_FILTER_REBUILD_SECONDS
+old, which also drops the pruned tokens.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from ..models import RevokedToken
+from .bloom import BloomFilter
+
+# The filter is sized for twice the revoked tokens it is built from, and at least this many
+MIN_CAPACITY = 10000
+
+# Rows revoked up to this long before the last refresh are read again, for late commits
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+_lock = threading.Lock()
+_state = {'filter': None, 'built_at': 0.0, 'refreshed_at': 0.0, 'synced_until': None}
+
+
+def _rebuild():
+    now = timezone.now()
+    tokens = RevokedToken.objects.filter(expires_at__gt=now)
+    bloom = BloomFilter(max(MIN_CAPACITY, 2 * tokens.count()))
+    for jti in tokens.values_list('jti', flat=True).iterator(chunk_size=5000):
+        bloom.add(jti)
+    _state.update(filter=bloom, built_at=time.monotonic(), refreshed_at=time.monotonic(), synced_until=now)
+
+
+def _refresh():
+    """Add the tokens revoked since the last refresh to the filter"""
+    now = timezone.now()
+    bloom = _state['filter']
+    for jti in RevokedToken.objects.filter(
+        revoked_at__gte=_state['synced_until'] - REFRESH_OVERLAP
+    ).values_list('jti', flat=True):
+        if jti not in bloom:
+            bloom.add(jti)
+    _state.update(refreshed_at=time.monotonic(), synced_until=now)
+
+
+def _get_filter():
+    """The process's filter, brought up to date when due"""
+    bloom = _state['filter']
+    now = time.monotonic()
+    if (
+        bloom is not None
+        and now - _state['refreshed_at'] < settings.REVOCATION_FILTER_REFRESH_SECONDS
+        and not bloom.is_full
+    ):
+        return bloom
+    
+    # One thread updates the filter, the others keep using the current one
+    if not _lock.acquire(blocking=bloom is None):
+        return bloom
+    try:
+        if (
+            _state['filter'] is None
+            or _state['filter'].is_full
+            or now - _state['built_at'] >= settings.REVOCATION_FILTER_REBUILD_SECONDS
+        ):
+            _rebuild()
+        elif now - _state['refreshed_at'] >= settings.REVOCATION_FILTER_REFRESH_SECONDS:
+            _refresh()
+        return _state['filter']
+    finally:
+        _lock.release()
+
+
+def is_revoked(jti):
+    """Whether the token with this jti was revoked"""
+    if not jti or jti not in _get_filter():
+        return False
+    return RevokedToken.objects.filter(jti=jti).exists()
+
+
+def revoke_token(token):
+    """Revoke a validated token until it expires. Returns False if it already was."""
+    jti = token[api_settings.JTI_CLAIM]
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(
+                jti=jti,
+                expires_at=datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+            )
+    except IntegrityError:
+        return False
+    _get_filter().add(jti)
+    return True
+
+
+def prune_revoked_tokens(batch_size=1000):
+    """Delete the rows of tokens that have expired. Returns the number deleted."""
+    now = timezone.now()
+    pruned = 0
+    while True:
+        token_ids = list(
+            RevokedToken.objects.filter(expires_at__lte=now)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not token_ids:
+            break
+        deleted, _ = RevokedToken.objects.filter(pk__in=token_ids).delete()
+        pruned += deleted
+    return pruned
@@ -0,0 +1,64 @@
+"""
+Login throttling.
+
+In-process token buckets, one per client IP and one per account, checked
+before any password is hashed. A bucket holds up to ``burst`` attempts and
+refills at ``per_minute``; an attempt takes one token, and is refused when
+the bucket is empty. Buckets live in the worker's memory, so the limits
+apply per process.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by an arbitrary string"""
+    
+    # Buckets kept at most; full buckets are dropped first when there are more
+    max_buckets = 100000
+    
+    def __init__(self, burst, per_minute):
+        self.burst = burst
+        self.rate = per_minute / 60
+        self._buckets = {}
+        self._lock = threading.Lock()
+    
+    def _level(self, bucket, now):
+        tokens, updated = bucket
+        return min(self.burst, tokens + (now - updated) * self.rate)
+    
+    def _evict(self, now):
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if self._level(bucket, now) < self.burst
+        }
+        if len(self._buckets) >= self.max_buckets:
+            self._buckets.clear()
+    
+    def take(self, key):
+        """
+        Take a token from the key's bucket. Returns 0 if one was available,
+        otherwise the number of seconds until there is one.
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None and len(self._buckets) >= self.max_buckets:
+                self._evict(now)
+            tokens = self.burst if bucket is None else self._level(bucket, now)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1, now)
+            return 0
+
+
+_ip_limiter = TokenBucketLimiter(settings.LOGIN_IP_BURST, settings.LOGIN_IP_PER_MINUTE)
+_account_limiter = TokenBucketLimiter(settings.LOGIN_ACCOUNT_BURST, settings.LOGIN_ACCOUNT_PER_MINUTE)
+
+
+def login_retry_after(ip, email):
+    """Seconds until this client may try to log into this account, 0 if it may now"""
+    return _ip_limiter.take(ip) or _account_limiter.take(str(email).strip().lower())
@@ -0,0 +1,108 @@
+"""
+Cached users for token authentication.
+
+Authenticated requests resolve their user from a small in-process cache
+(entries live AUTH_USER_LOCAL_CACHE_SECONDS), then from the shared cache
+(AUTH_USER_CACHE_SECONDS), and only then from the database. The password
+hash is not cached; it is loaded on first access.
+
+Saving or deleting a user drops their entries. When a user's role or active
+flag changes, or the user is deleted, a "changed" stamp is also kept in the
+shared cache: tokens issued up to then are checked against the user again
+instead of being trusted on their claims alone.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# Cached fields: everything but the password hash, which is deferred
+UNCACHED_FIELDS = ['password']
+
+# Fields whose change invalidates the claims of the user's tokens
+CLAIM_FIELDS = ['role', 'is_active']
+
+_local = {}
+_LOCAL_MAX_ENTRIES = 10000
+
+
+def _user_key(pk):
+    return f'auth:user:{pk}'
+
+
+def _changed_key(pk):
+    return f'auth:user:{pk}:changed'
+
+
+def _local_get(key):
+    """Entry of the in-process cache, None if missing or expired"""
+    entry = _local.get(key)
+    if entry is None or entry[0] < time.monotonic():
+        return None
+    return entry[1]
+
+
+def _local_set(key, value):
+    if len(_local) >= _LOCAL_MAX_ENTRIES:
+        _local.clear()
+    _local[key] = (time.monotonic() + settings.AUTH_USER_LOCAL_CACHE_SECONDS, value)
+
+
+def _from_values(values):
+    """User instance from a {attname: value} dict, fields not in it are deferred"""
+    User = get_user_model()
+    fields = [f for f in User._meta.concrete_fields if f.attname in values]
+    return User.from_db(
+        DEFAULT_DB_ALIAS,
+        [f.attname for f in fields],
+        [values[f.attname] for f in fields]
+    )
+
+
+def get_user(pk):
+    """The user with this primary key, None if there is none"""
+    key = _user_key(pk)
+    values = _local_get(key)
+    if values is None:
+        values = cache.get(key)
+        if values is None:
+            User = get_user_model()
+            fields = [
+                f.attname for f in User._meta.concrete_fields
+                if f.attname not in UNCACHED_FIELDS
+            ]
+            values = User.objects.filter(pk=pk).values(*fields).first()
+            if values is None:
+                return None
+            cache.set(key, values, settings.AUTH_USER_CACHE_SECONDS)
+        _local_set(key, values)
+    return _from_values(values)
+
+
+def claims_user(pk, role):
+    """User built from token claims only, every other field is loaded on access"""
+    pk = get_user_model()._meta.pk.to_python(pk)
+    return _from_values({'id': pk, 'role': role, 'is_active': True})
+
+
+def changed_at(pk):
+    """When the user's role or active flag last changed (Unix time), 0 if not recently"""
+    key = _changed_key(pk)
+    stamp = _local_get(key)
+    if stamp is None:
+        stamp = cache.get(key, 0)
+        _local_set(key, stamp)
+    return stamp
+
+
+def invalidate_user(pk, claims_changed=False):
+    """Drop the cached user; with ``claims_changed``, stop trusting the claims of its tokens"""
+    _local.pop(_user_key(pk), None)
+    cache.delete(_user_key(pk))
+    if claims_changed:
+        # Kept as long as a token issued before the change can live
+        stamp = int(time.time())
+        cache.set(_changed_key(pk), stamp, int(settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds()))
+        _local_set(_changed_key(pk), stamp)
@@ -1,10 +1,15 @@
 from rest_framework import status, generics, permissions
 from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
 from rest_framework.views import APIView
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
+import math
 import uuid
 import logging
 
@@ -16,6 +21,10 @@ from .serializers import (
     ChangePasswordSerializer
 )
 from .utils.email import send_activation_email, send_password_reset_email
+from .utils.passwords import PasswordCheckBusy, verify_password
+from .utils.revocation import revoke_token
+from .utils.throttle import login_retry_after
+from cart.utils.guest import merge_guest_cart
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -29,14 +38,11 @@ class UserRegistrationView(generics.CreateAPIView):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
         
-        # Send activation email
-        try:
+        # The activation email is queued with the user, see send_queued_emails
+        with transaction.atomic():
+            user = serializer.save()
             send_activation_email(user, user.activation_token)
-        except Exception as e:
-            # Log error but don't fail registration
-            logger.error(f"Error sending activation email: {e}")
         
         return Response({
             'message': 'User registered successfully. Please check your email to activate your account.',
@@ -90,14 +96,22 @@ class LoginView(APIView):
                 'error': 'Please provide both email and password.'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # Refused before any hashing, so bursts of attempts cost no CPU
+        retry_after = login_retry_after(BaseThrottle().get_ident(request), email)
+        if retry_after:
+            return Response({
+                'error': 'Too many login attempts. Please try again later.'
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(math.ceil(retry_after))})
+        
+        user = User.objects.filter(email=email).first()
         try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
+            valid = verify_password(user, password)
+        except PasswordCheckBusy:
             return Response({
-                'error': 'Invalid credentials.'
-            }, status=status.HTTP_401_UNAUTHORIZED)
+                'error': 'Too many logins in progress. Please try again in a moment.'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
         
-        if not user.check_password(password):
+        if not valid:
             return Response({
                 'error': 'Invalid credentials.'
             }, status=status.HTTP_401_UNAUTHORIZED)
@@ -109,10 +123,15 @@ class LoginView(APIView):
         
         # Generate JWT tokens
         refresh = RefreshToken.for_user(user)
+        # Views authenticated with TokenClaimsAuthentication read the role from the token
+        refresh['role'] = user.role
         
         user_serializer = UserSerializer(user)
         
-        return Response({
+        # Move the guest cart into the user's cart
+        cart_merged = merge_guest_cart(request, user)
+        
+        response = Response({
             'message': 'Login successful.',
             'user': user_serializer.data,
             'tokens': {
@@ -120,6 +139,9 @@ class LoginView(APIView):
                 'access': str(refresh.access_token),
             }
         }, status=status.HTTP_200_OK)
+        if cart_merged:
+            response.delete_cookie(settings.GUEST_CART_COOKIE_NAME)
+        return response
 
 
 class LogoutView(APIView):
@@ -131,12 +153,14 @@ class LogoutView(APIView):
             refresh_token = request.data.get('refresh_token')
             if refresh_token:
                 token = RefreshToken(refresh_token)
-                # Try to blacklist the token if the feature is enabled
-                try:
-                    token.blacklist()
-                except AttributeError:
-                    # Blacklist feature not enabled, token will expire naturally
-                    pass
+                if str(token[api_settings.USER_ID_CLAIM]) != str(request.user.pk):
+                    return Response({
+                        'error': 'Invalid token.'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                revoke_token(token)
+            # The access token used for this request stops working too
+            if request.auth is not None:
+                revoke_token(request.auth)
             return Response({
                 'message': 'Logout successful.'
             }, status=status.HTTP_200_OK)
@@ -162,13 +186,11 @@ class PasswordResetRequestView(generics.GenericAPIView):
             user = User.objects.get(email=email)
             user.reset_password_token = uuid.uuid4()
             user.reset_password_token_created = timezone.now()
-            user.save()
             
-            # Send password reset email
-            try:
+            # The reset email is queued with the new token, see send_queued_emails
+            with transaction.atomic():
+                user.save()
                 send_password_reset_email(user, user.reset_password_token)
-            except Exception as e:
-                logger.error(f"Error sending password reset email: {e}")
         except User.DoesNotExist:
             # Don't reveal if email exists (security best practice)
             pass
@@ -216,7 +238,10 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        # request.user may come from the user cache, saving it could write back a stale role or active flag
+        return get_object_or_404(User, pk=self.request.user.pk)
 
 
 class ChangePasswordView(generics.GenericAPIView):
@@ -228,9 +253,10 @@ class ChangePasswordView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         
+        # Only the password: request.user may be a cached copy of the other fields
         user = request.user
         user.set_password(serializer.validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
         
         return Response({
             'message': 'Password changed successfully.'